@@ -0,0 +1,225 @@
+"""Persistent cache of bare clones, which are updated by fetching."""
+import os
+import time
+import shutil
+import hashlib
+from pygit2 import (
+    Repository,
+    GitError,
+    clone_repository,
+    init_repository,
+)
+
+from gitalizer.helpers.config import config
+from gitalizer.extensions import logger
+
+
+# Mirror all branches of the remote, as we scan the bare repository directly.
+FETCH_REFSPEC = '+refs/heads/*:refs/heads/*'
+
+# Namespace for the parent's branches, while cloning a fork.
+BORROWED_REFS = 'refs/borrowed/'
+
+# In use markers of crashed scans are ignored after this many seconds.
+IN_USE_TIMEOUT = 6 * 60 * 60
+
+
+def cache_enabled():
+    """Check if the clone cache should be used."""
+    return config['cloning'].getboolean('clone_cache_enabled')
+
+
+def get_cache_dir(url: str):
+    """Get the cache directory of a clone url."""
+    base_dir = config['cloning']['clone_cache_path']
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.abspath(os.path.join(base_dir, key))
+
+
+def get_cached_repository(url: str, callbacks=None, parent_url: str = None):
+    """Update the cached clone of a repository or clone it into the cache.
+
+    If the repository is a fork and its parent is cached as well,
+    the clone borrows all objects of the parent.
+    The clone is marked as in use and isn't pruned until `release_cached_repository` is called.
+    """
+    clone_dir = get_cache_dir(url)
+    mark_in_use(clone_dir)
+
+    repo = None
+    if os.path.exists(clone_dir):
+        try:
+            repo = Repository(clone_dir)
+            repo.remotes['origin'].fetch([FETCH_REFSPEC], callbacks=callbacks)
+        except (GitError, KeyError):
+            # The cached clone is broken. Throw it away and clone again.
+            logger.info(f'Removing broken cached clone of {url}')
+            shutil.rmtree(clone_dir)
+            repo = None
+
+    if repo is None:
+        os.makedirs(clone_dir)
+        parent_dir = get_cache_dir(parent_url) if parent_url else None
+        if parent_dir and os.path.exists(parent_dir):
+            clone_with_alternates(url, clone_dir, parent_dir, callbacks)
+        else:
+            clone_repository(url, clone_dir, bare=True, callbacks=callbacks)
+        repo = Repository(clone_dir)
+
+    # The modification time of the directory is used for LRU eviction.
+    os.utime(clone_dir)
+    write_size(clone_dir)
+    prune_cache()
+
+    return repo
+
+
+def release_cached_repository(url: str):
+    """Allow the cached clone of a repository to be pruned again."""
+    try:
+        os.remove(get_cache_dir(url) + '.in_use')
+    except FileNotFoundError:
+        pass
+
+
+def mark_in_use(clone_dir: str):
+    """Protect a cached clone from being pruned."""
+    os.makedirs(os.path.dirname(clone_dir), exist_ok=True)
+    with open(clone_dir + '.in_use', 'w'):
+        pass
+
+
+def is_in_use(clone_dir: str):
+    """Check if a cached clone is used by a scan."""
+    try:
+        return os.path.getmtime(clone_dir + '.in_use') > time.time() - IN_USE_TIMEOUT
+    except OSError:
+        return False
+
+
+def write_size(clone_dir: str):
+    """Remember the size of a cached clone, so pruning doesn't need to walk it."""
+    with open(clone_dir + '.size', 'w') as fd:
+        fd.write(str(get_directory_size(clone_dir)))
+
+
+def read_size(clone_dir: str):
+    """Get the remembered size of a cached clone. Falls back to walking the clone."""
+    try:
+        with open(clone_dir + '.size', 'r') as fd:
+            return int(fd.read())
+    except (OSError, ValueError):
+        return get_directory_size(clone_dir)
+
+
+def clone_with_alternates(url: str, clone_dir: str, parent_dir: str, callbacks=None):
+    """Clone a fork, which uses the object store of its parent via git alternates.
+
+    The branches of the parent are temporarily added to the fork.
+    This way the remote knows which objects we already have
+    and only objects specific to the fork are downloaded and written.
+    """
+    init_repository(clone_dir, bare=True)
+    alternates = os.path.join(clone_dir, 'objects', 'info', 'alternates')
+    with open(alternates, 'w') as fd:
+        fd.write(os.path.join(parent_dir, 'objects') + '\n')
+
+    parent = Repository(parent_dir)
+    repo = Repository(clone_dir)
+    for name in parent.listall_references():
+        if name.startswith('refs/heads/'):
+            target = parent.lookup_reference(name).target
+            repo.create_reference(BORROWED_REFS + name[len('refs/heads/'):], target)
+
+    remote = repo.remotes.create('origin', url)
+    remote.fetch([FETCH_REFSPEC], callbacks=callbacks)
+    for name in repo.listall_references():
+        if name.startswith(BORROWED_REFS):
+            repo.lookup_reference(name).delete()
+
+    # Point HEAD to the default branch of the remote.
+    for head in remote.ls_remotes(callbacks=callbacks):
+        if head['name'] == 'HEAD' and head['symref_target']:
+            repo.set_head(head['symref_target'])
+
+    return repo
+
+
+def get_alternates(path: str):
+    """Get the object stores a cached clone borrows objects from."""
+    alternates = os.path.join(path, 'objects', 'info', 'alternates')
+    if not os.path.exists(alternates):
+        return []
+
+    with open(alternates, 'r') as fd:
+        return [os.path.dirname(line.strip()) for line in fd if line.strip()]
+
+
+def get_directory_size(path: str):
+    """Get the size of all files in a directory in bytes."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+def prune_cache(max_size: int = None):
+    """Remove the least recently used clones until the cache fits into its budget.
+
+    `max_size` is the budget in MB and defaults to `clone_cache_size`.
+    The sizes of the clones are taken from their size files.
+    Clones, which are in use, and the parents of those clones are never removed.
+    """
+    if max_size is None:
+        max_size = int(config['cloning']['clone_cache_size'])
+    max_size = max_size * 1024 * 1024
+
+    base_dir = config['cloning']['clone_cache_path']
+    if not os.path.exists(base_dir):
+        return 0
+
+    entries = []
+    sizes = {}
+    forks = {}
+    for name in os.listdir(base_dir):
+        path = os.path.abspath(os.path.join(base_dir, name))
+        # Skip size files and in use markers.
+        if not os.path.isdir(path):
+            continue
+        sizes[path] = read_size(path)
+        entries.append((os.path.getmtime(path), path))
+        for parent in get_alternates(path):
+            forks.setdefault(parent, []).append(path)
+
+    # Oldest entries first
+    entries.sort()
+    total_size = sum(sizes.values())
+
+    removed = 0
+    for _, path in entries:
+        if total_size <= max_size:
+            break
+        if path not in sizes:
+            continue
+
+        # Forks can't live without the objects of their parent.
+        clones = [path] + forks.get(path, [])
+        if any(is_in_use(clone) for clone in clones):
+            continue
+
+        for clone in clones:
+            if clone in sizes:
+                shutil.rmtree(clone, ignore_errors=True)
+                for suffix in ['.size', '.in_use']:
+                    try:
+                        os.remove(clone + suffix)
+                    except FileNotFoundError:
+                        pass
+                total_size -= sizes.pop(clone)
+                removed += 1
+
+    return removed
@@ -1,22 +1,26 @@
 """Data collection from Github."""
-from collections import deque
-from pygit2 import Repository, GitError
-from sqlalchemy.orm import joinedload
+from pygit2 import (
+    Repository,
+    GitError,
+    GIT_SORT_TIME,
+    GIT_SORT_TOPOLOGICAL,
+)
 from github import Repository as Github_Repository
-from github.GithubObject import NotSet
+from types import SimpleNamespace
 from datetime import datetime, timedelta, timezone
-from sqlalchemy.exc import (
-    IntegrityError,
-    OperationalError,
-    InvalidRequestError,
-)
 
+from gitalizer.helpers.config import config
 from gitalizer.extensions import sentry
-from gitalizer.aggregator.github import call_github_function
+from gitalizer.helpers.db.lookup import bulk_lookup
+from gitalizer.helpers.db.sha_set import ShaSet, get_known_commits
+from gitalizer.helpers.db.bulk import CommitRecord
+from gitalizer.helpers.parallel import writer
+from gitalizer.helpers.parallel.writer import new_batch, write_batch
+from gitalizer.aggregator.github.author import AuthorResolver
+from gitalizer.aggregator.github.email_rules import resolve_login
 from gitalizer.models import (
     Email,
     Commit,
-    Contributor,
     Repository as RepositoryModel,
 )
 
@@ -26,65 +30,151 @@ class CommitScanner():
 
     def __init__(self, git_repo: Repository,
                  session,
-                 github_repo: Github_Repository=None):
-        """Initialize a new CommitChecker."""
+                 github_repo: Github_Repository,
+                 metadata: dict):
+        """Initialize a new CommitChecker.
+
+        `metadata` contains the `clone_url`, `pushed_at` and `size` of the Github repository.
+        """
         self.session = session
-        self.repository = session.query(RepositoryModel) \
-            .options(joinedload(RepositoryModel.commits_by_hash)) \
-            .get(github_repo.ssh_url)
+        self.metadata = metadata
+        self.repository = session.query(RepositoryModel).get(metadata['clone_url'])
+
+        # With the tips of the last complete scan, only new commits are walked.
+        # Otherwise we need all known commits of this repository.
+        self.incremental = self.repository.completely_scanned and bool(self.repository.scanned_refs)
+        if self.incremental:
+            self.repository_commits = ShaSet()
+        else:
+            self.repository_commits = self.repository.get_commit_shas(session)
+        self.scanned_refs = None
         self.git_repo = git_repo
         self.github_repo = github_repo
-        self.queue = deque()
+        self.batch_size = int(config['aggregator']['commit_batch_size'])
+        self.known_commits = None
+        if config['aggregator'].getboolean('known_commit_filter'):
+            self.known_commits = get_known_commits(session)
+        self.resolver = AuthorResolver(github_repo)
+        self.offline_resolved = 0
         self.scanned_commits = 0
-        self.diffs = {}
+        self.failed_commits = 0
+        self.first_commit_time = None
+        self.too_big = False
 
+        # Address -> state of all emails of this scan.
         self.emails = {}
+        # Contributors, which have already been added to the repository during this scan.
+        self.linked_contributors = set()
 
     def scan_repository(self):
         """Get all commits from this repository.
 
         It extracts the user as well as additions, deletions and the timestamp.
-        This function gathers all commits in the git commit tree
+        The commits are streamed from the git commit tree in batches,
+        which limits the memory usage to the size of a single batch.
         """
-        commits_to_scan = self.get_commits_to_scan()
-        if not commits_to_scan:
-            self.repository.completely_scanned = True
-            return 0
+        for commits_to_scan in self.get_commits_to_scan():
+            self.scan_batch(commits_to_scan)
+
+        batch = new_batch(self.repository.clone_url)
+        repository = batch['repository']
+        repository['completely_scanned'] = True
+        repository['updated_at'] = datetime.now()
+        repository['pushed_at'] = self.metadata['pushed_at']
+        repository['size'] = self.metadata['size']
+
+        if self.too_big:
+            repository['too_big'] = True
+        else:
+            # Remember the tips of this scan for the next incremental scan.
+            # Commits, which couldn't be scanned, are walked again on the next scan.
+            if self.scanned_refs is not None and self.failed_commits == 0:
+                repository['scanned_refs'] = self.scanned_refs
+
+            # Set the time of the first commit as repository creation time if it isn't set yet.
+            if self.scanned_commits > 0 and not self.repository.created_at:
+                repository['created_at'] = self.first_commit_time
+
+        self.write(batch)
+        return self.scanned_commits
 
+    def scan_batch(self, commits_to_scan):
+        """Scan a batch of commits and write the results."""
+        batch = new_batch(self.repository.clone_url)
         existing_commits = self.preload_commits(commits_to_scan)
 
         # Get emails for all commits.
         emails_to_scan = self.unique_emails(commits_to_scan)
         self.preload_emails(emails_to_scan)
-        self.collect_emails(emails_to_scan)
-        self.session.commit()
+        self.collect_emails(emails_to_scan, batch)
 
         # Actually scan the commits
+        linkable_commits = []
         for commit in commits_to_scan:
-            self.scan_commit(commit, existing_commits)
-            # Commit session every 20 commits to avoid loss of all data on crash.
+            if commit.hex in existing_commits:
+                linkable_commits.append(commit.hex)
+            else:
+                record = self.scan_commit(commit)
+                if record:
+                    batch['commits'].append(record)
+                    linkable_commits.append(commit.hex)
+                else:
+                    self.failed_commits += 1
             self.scanned_commits += 1
-            if self.scanned_commits % 1000 == 0:
-                self.session.commit()
 
-        self.session.commit()
+        # Add all commits to this repository.
+        # Commits, which couldn't be scanned, don't exist and can't be linked.
+        batch['repository_commits'] = linkable_commits
 
-        # Set the time of the first commit as repository creation time if it isn't set yet.
-        self.repository.completely_scanned = True
-        if not self.repository.created_at:
-            timestamp = commits_to_scan[-1].author.time
-            utc_offset = timezone(timedelta(minutes=commits_to_scan[-1].author.offset))
-            self.repository.created_at = datetime.fromtimestamp(timestamp, utc_offset)
+        # Write the results after every batch to avoid loss of all data on crash.
+        self.write(batch)
 
-        self.session.add(self.repository)
-        self.session.commit()
-        return self.scanned_commits
+        # The walk is sorted by time. The last commit is the oldest one we know so far.
+        oldest_commit = commits_to_scan[-1]
+        utc_offset = timezone(timedelta(minutes=oldest_commit.author.offset))
+        self.first_commit_time = datetime.fromtimestamp(oldest_commit.author.time, utc_offset)
 
     def get_commits_to_scan(self):
-        """Walk through the repository and get all commits reachable in master."""
+        """Walk through the repository and yield batches of all commits reachable in master.
+
+        Only the current batch is kept in memory.
+        Repositories with more than `max_repository_commits` new commits are flagged as too big.
+        They are detected by a first walk, which doesn't scan anything, so nothing is written for them.
+        """
+        max_commits = int(config['aggregator']['max_repository_commits'])
+        commit_count = 0
+        for _ in self.walk_commits():
+            commit_count += 1
+            if commit_count > max_commits:
+                sentry.captureMessage(
+                    'Repository too big',
+                    extra={'url': self.repository.clone_url},
+                    level='info',
+                    tags={'type': 'too_big', 'entity': 'repository'},
+                )
+                self.too_big = True
+                return
+
+        commits_to_scan = []
+        for commit in self.walk_commits():
+            commits_to_scan.append(commit)
+            if len(commits_to_scan) >= self.batch_size:
+                yield commits_to_scan
+                commits_to_scan = []
+
+        if commits_to_scan:
+            yield commits_to_scan
+
+    def walk_commits(self):
+        """Yield all commits reachable in master, which haven't been scanned yet.
+
+        The walk is done by libgit2's revwalk, which returns all commits in
+        topological order, newest first.
+        On incremental scans all commits reachable from the tips of the last scan are hidden.
+        """
         try:
-            master_commit = self.git_repo.head.get_object()
-            self.queue.appendleft(master_commit)
+            head = self.git_repo.head
+            master_commit = head.target
         except GitError as e:
             sentry.captureException(
                 extra={
@@ -92,108 +182,80 @@ class CommitScanner():
                     'clone_url': self.repository.clone_url,
                 },
             )
-            return self.scanned_commits
-
-        # List of commit hashes to check if we already were at this point in the tree.
-        commits_to_scan = []
-        known_commit_hashes = set()
-        # This is a simple BFS through the git commit tree.
-        # If we already know a node or already scanned a node, we don't add the parents.
-        while len(self.queue) > 0:
-            commit = self.queue.pop()
-            # Break if we already visited this tree node
-            if commit.hex in known_commit_hashes:
-                continue
-            known_commit_hashes.add(commit.hex)
+            return
 
-            commit_known = commit.hex in self.repository.commits_by_hash
+        self.scanned_refs = {head.name: master_commit.hex}
+        walker = self.git_repo.walk(master_commit, GIT_SORT_TOPOLOGICAL | GIT_SORT_TIME)
+        if self.incremental:
+            for sha in self.repository.scanned_refs.values():
+                try:
+                    walker.hide(sha)
+                except (KeyError, ValueError, GitError):
+                    # The old tip is gone, e.g. due to a force push.
+                    pass
+
+        for commit in walker:
+            commit_known = commit.id.raw in self.repository_commits
             # Repo has been completely scanned and a this is a known commit.
             if commit_known and self.repository.completely_scanned:
                 break
 
             # Repo has been partially scanned and a this is a known commit.
             elif commit_known and not self.repository.completely_scanned:
-                [self.queue.appendleft(parent) for parent in commit.parents]
                 continue
-            # This is an unknown commit.
-            elif not commit_known:
-                [self.queue.appendleft(parent) for parent in commit.parents]
 
-            if len(commit.parents) == 1:
-                self.diffs[commit.hex] = commit.tree.diff_to_tree(commit.parents[0].tree)
-            commits_to_scan.append(commit)
-
-            if len(commits_to_scan) > 100000:
-                sentry.captureMessage(
-                    'Repository too big',
-                    extra={'url': self.repository.clone_url},
-                    level='info',
-                    tags={'type': 'too_big', 'entity': 'repository'},
-                )
-                self.repository.too_big = True
-                self.session.add(self.repository)
-                commits_to_scan = []
-                break
-
-        return commits_to_scan
+            yield commit
 
     def preload_commits(self, commits_to_scan):
-        """Fetch all commits from db with matching shas.
+        """Get the shas of all commits, which already exist in the db.
 
-        We do this once to bunch-fetch all matching commits to avoid performance breaks.
+        Commits in the global commit filter are known without asking the db.
+        The remaining commits are bunch-fetched, as the filter might be outdated.
         """
-        hashes_to_scan = [c.hex for c in commits_to_scan]
-        if len(hashes_to_scan) != 0:
-            existing_commits = self.session.query(Commit) \
-                .filter(Commit.sha.in_(hashes_to_scan)) \
-                .all()
-            existing_commits = {c.sha: c for c in existing_commits}
-        else:
-            existing_commits = {}
+        existing_commits = set()
+        hashes_to_scan = []
+        for commit in commits_to_scan:
+            if self.known_commits is not None and commit.id.raw in self.known_commits:
+                existing_commits.add(commit.hex)
+            else:
+                hashes_to_scan.append(commit.hex)
+
+        commits = bulk_lookup(self.session.query(Commit.sha), Commit.sha, hashes_to_scan)
+        existing_commits |= {c.sha for c in commits}
         return existing_commits
 
-    def scan_commit(self, git_commit, existing_commits):
-        """Get all features of a specific commit."""
-        # If we already know this commit just add the commit to this repository.
-        if git_commit.hex in existing_commits:
-            commit = existing_commits[git_commit.hex]
-            commit.repositories.append(self.repository)
-            self.session.add(commit)
+    def scan_commit(self, git_commit):
+        """Get all features of a specific commit.
 
-        # Unknown commit, thereby we need to get all information
-        else:
-            try:
-                author_email = self.emails[git_commit.author.email]
-                committer_email = self.emails[git_commit.committer.email]
-                commit = Commit(git_commit.hex, self.repository,
-                                author_email, committer_email)
-
-                diff = self.diffs.get(git_commit.hex)
-                if diff:
-                    commit.additions = diff.stats.insertions
-                    commit.deletions = diff.stats.deletions
-
-                if git_commit.author:
-                    timestamp = git_commit.author.time
-                    offset_delta = timedelta(minutes=git_commit.author.offset)
-                    utc_offset = timezone(offset_delta)
-                    commit.creation_time = datetime.fromtimestamp(timestamp, utc_offset)
-
-                timestamp = git_commit.commit_time
-                offset_delta = timedelta(minutes=git_commit.commit_time_offset)
-                utc_offset = timezone(offset_delta)
-                commit.commit_time = datetime.fromtimestamp(timestamp, utc_offset)
-                commit.commit_time_offset = offset_delta
-
-                self.session.add(commit)
-            except BaseException as e:
-                sentry.captureException(
-                    extra={
-                        'message': 'Error during Commit creation',
-                        'clone_url': self.repository.clone_url,
-                        'hex': git_commit.hex,
-                    },
-                )
+        Returns a `CommitRecord` or `None` if the commit couldn't be scanned.
+        """
+        try:
+            additions = None
+            deletions = None
+            if len(git_commit.parents) == 1:
+                diff = git_commit.tree.diff_to_tree(git_commit.parents[0].tree)
+                additions = diff.stats.insertions
+                deletions = diff.stats.deletions
+
+            return CommitRecord(
+                git_commit.hex,
+                git_commit.author.time,
+                git_commit.author.offset,
+                git_commit.commit_time,
+                git_commit.commit_time_offset,
+                additions,
+                deletions,
+                git_commit.author.email,
+                git_commit.committer.email,
+            )
+        except BaseException as e:
+            sentry.captureException(
+                extra={
+                    'message': 'Error during Commit creation',
+                    'clone_url': self.repository.clone_url,
+                    'hex': git_commit.hex,
+                },
+            )
 
     def unique_emails(self, commits):
         """Get all commits that should be collected."""
@@ -211,108 +273,92 @@ class CommitScanner():
         return emails_to_scan
 
     def preload_emails(self, emails_to_scan):
-        """Bulk preload all emails to avoid DB overhead."""
-        addresses = [e[2] for e in emails_to_scan]
-        emails = self.session.query(Email) \
-            .filter(Email.email.in_(addresses)) \
-            .all()
-        if emails:
-            self.emails = {e.email: e for e in emails}
-        else:
-            self.emails = {}
-
-    def collect_emails(self, emails):
-        """Get emails of all commits to scan."""
-        collecting = True
-        one_more_try = False
-        while collecting:
-            try:
-                email_count = 0
-                for (commit, address_type, address) in emails:
-                    email = self.emails.get(address)
-
-                    # Create a new mail if we don't know it yet
-                    if not email:
-                        email = Email.get_email(
-                            address,
-                            self.session,
-                            do_commit=False,
-                        )
-                        self.emails[address] = email
-
-                    # Get the email relation to github contributors
-                    if address_type == 'author':
-                        self.get_github_author(email, commit, do_commit=False)
-                    if address_type == 'committer':
-                        self.get_github_committer(email, commit, do_commit=False)
-
-                    # Add the contributor to the repository if he isn't known yet.
-                    if email.contributor:
-                        if self.repository not in email.contributor.repositories:
-                            email.contributor.repositories.append(self.repository)
-                    else:
-                        # Mark email as unknown to prevent further github queries for this email.
-                        email.unknown = True
-                    self.session.add(email)
-                    email_count += 1
-
-                    # Commit all 20 emails to prevent large reloads on transaction failures.
-                    if email_count % 20:
-                        self.session.commit()
-                        one_more_try = False
-                        collecting = True
-
-                collecting = False
-            except (IntegrityError, OperationalError, InvalidRequestError) as e:
-                # This can happen in case two threads add the same email addresses
-                # Rollback the transaction, try one more time and raise if it fails again.
-                # If the next transaction is successful, we reset the retry behaviour.
-                sentry.captureMessage(f'Email collection IntegrityError', level='info')
-                self.session.rollback()
-                self.preload_emails(emails)
-                if one_more_try:
-                    collecting = False
-                    raise e
-
-                one_more_try = True
-
-    def get_github_author(self, email, git_commit, do_commit=True):
-        """Get the related Github author."""
-        # No Github repository or the contributor is already known
-        if not self.github_repo or email.contributor is not None or email.unknown:
-            return
-        github_commit = call_github_function(self.github_repo, 'get_commit', [git_commit.hex])
+        """Bulk preload all emails, which aren't known to this scan yet."""
+        addresses = [e[2] for e in emails_to_scan if e[2] not in self.emails]
+        query = self.session.query(Email.email, Email.contributor_login, Email.unknown)
+        for email in bulk_lookup(query, Email.email, addresses):
+            self.emails[email.email] = SimpleNamespace(
+                email=email.email,
+                contributor_login=email.contributor_login,
+                unknown=email.unknown,
+            )
 
-        if github_commit.author and github_commit.author is not NotSet:
-            # Workaround for issue https://github.com/PyGithub/PyGithub/issues/279
-            if github_commit.author._url.value is None:
-                sentry.captureMessage('Author has no _url', level='info')
-                return
+    def collect_emails(self, emails, batch):
+        """Get emails of all commits to scan and link them to their Github contributors.
 
-            contributor = Contributor.get_contributor(
-                github_commit.author.login,
-                self.session,
-                do_commit=do_commit,
-            )
-            email.contributor = contributor
+        All changes are added to the batch. The emails of this scan are
+        updated in place, as the batch might be written asynchronously.
+        """
+        # Remember all addresses we don't know yet.
+        for (_, _, address) in emails:
+            if address not in self.emails:
+                self.emails[address] = SimpleNamespace(
+                    email=address,
+                    contributor_login=None,
+                    unknown=False,
+                )
+                batch['emails'].append(address)
+
+        # Resolve as many unknown addresses as possible with the commit listing.
+        # Addresses, which can be resolved offline, don't need to be listed.
+        if self.github_repo:
+            unresolved = set()
+            for (_, _, address) in emails:
+                email = self.emails[address]
+                if resolve_login(address):
+                    continue
+                if email.contributor_login is None and not email.unknown:
+                    unresolved.add(address)
+            self.resolver.resolve(unresolved)
+
+        # Get the email relation to github contributors
+        for (commit, address_type, address) in emails:
+            email = self.emails[address]
+            if email.contributor_login is not None:
+                continue
 
-    def get_github_committer(self, email, git_commit, do_commit=True):
-        """Get the related Github committer."""
-        # No Github repository or the contributor is already known
-        if not self.github_repo or email.contributor is not None or email.unknown:
+            login = self.get_offline_login(email) or self.get_github_login(email, commit)
+            if login:
+                email.contributor_login = login
+                email.unknown = False
+                batch['email_logins'][address] = login
+            elif not email.unknown:
+                # Mark email as unknown to prevent further github queries for this email.
+                email.unknown = True
+                batch['unknown_emails'].append(address)
+
+        # Add all contributors of this batch to the repository, if they haven't been added yet.
+        new_contributors = set()
+        for (_, _, address) in emails:
+            login = self.emails[address].contributor_login
+            if login is not None and login not in self.linked_contributors:
+                new_contributors.add(login)
+        batch['repository_contributors'] = list(new_contributors)
+        self.linked_contributors |= new_contributors
+
+    def write(self, batch):
+        """Send a batch to the writer process or write it directly."""
+        if writer.write_queue is not None:
+            writer.write_queue.put(batch)
             return
-        github_commit = call_github_function(self.github_repo, 'get_commit', [git_commit.hex])
 
-        if github_commit.committer and github_commit.committer is not NotSet:
-            # Workaround for issue https://github.com/PyGithub/PyGithub/issues/279
-            if github_commit.committer._url.value is None:
-                sentry.captureMessage('committer has no _url', level='info')
-                return
+        write_batch(self.session, batch)
+        self.session.commit()
 
-            contributor = Contributor.get_contributor(
-                github_commit.committer.login,
-                self.session,
-                do_commit=do_commit,
-            )
-            email.contributor = contributor
-        return
+    def get_offline_login(self, email):
+        """Get the login of the related Github contributor from deterministic email rules.
+
+        This doesn't need any API calls.
+        """
+        login = resolve_login(email.email)
+        if login:
+            self.offline_resolved += 1
+        return login
+
+    def get_github_login(self, email, git_commit):
+        """Get the login of the related Github contributor."""
+        # No Github repository or the email is known to have no contributor
+        if not self.github_repo or email.unknown:
+            return None
+
+        return self.resolver.get_login(email.email, git_commit.hex)
@@ -2,27 +2,44 @@
 import os
 import shutil
 import pygit2
-from pygit2 import Repository, clone_repository
+import tempfile
+from pygit2 import Repository, clone_repository, init_repository
 
 from gitalizer.helpers.config import config
+from gitalizer.aggregator.git.cache import (
+    cache_enabled,
+    get_cached_repository,
+    release_cached_repository,
+)
 
 
-def get_git_repository(url: str, owner: str, name: str):
-    """Clone or update a repository."""
+def get_callbacks(url: str):
+    """Get the remote callbacks with our ssh credentials."""
+    if 'https://' in url:
+        return None
+
+    keypair = pygit2.Keypair(username=config['cloning']['ssh_user'],
+                             pubkey=config['cloning']['public_key'],
+                             privkey=config['cloning']['private_key'],
+                             passphrase=config['cloning']['ssh_password'])
+    return pygit2.RemoteCallbacks(credentials=keypair)
+
+
+def get_git_repository(url: str, owner: str, name: str, parent_url: str = None):
+    """Clone or update a repository.
+
+    Forks borrow the objects of their parent, if the parent is in the clone cache.
+    """
+    callbacks = get_callbacks(url)
+    if cache_enabled():
+        return get_cached_repository(url, callbacks, parent_url)
+
     base_dir = config['cloning']['temporary_clone_path']
     clone_dir = os.path.join(base_dir, owner, name)
 
     if os.path.exists(clone_dir):
         shutil.rmtree(clone_dir)
 
-    callbacks = None
-    if 'https://' not in url:
-        keypair = pygit2.Keypair(username=config['cloning']['ssh_user'],
-                                 pubkey=config['cloning']['public_key'],
-                                 privkey=config['cloning']['private_key'],
-                                 passphrase=config['cloning']['ssh_password'])
-        callbacks = pygit2.RemoteCallbacks(credentials=keypair)
-
     os.makedirs(clone_dir)
     repo = clone_repository(url, clone_dir, bare=True, callbacks=callbacks)
     repo = Repository(clone_dir)
@@ -30,9 +47,46 @@ def get_git_repository(url: str, owner: str, name: str):
     return repo
 
 
-def delete_git_repository(owner: str, name: str):
-    """Delete a git repository."""
+def delete_git_repository(owner: str, name: str, url: str = None):
+    """Delete a git repository.
+
+    Cached clones are kept, but may be pruned again.
+    """
+    if url and cache_enabled():
+        release_cached_repository(url)
+
     base_dir = config['cloning']['temporary_clone_path']
     clone_dir = os.path.join(base_dir, owner, name)
     if os.path.exists(clone_dir):
         shutil.rmtree(clone_dir)
+
+
+def get_remote_refs(url: str):
+    """Get all refs of a remote and their shas without cloning it.
+
+    This is the equivalent of `git ls-remote`. `HEAD` points to the sha of the default branch.
+    """
+    base_dir = config['cloning']['temporary_clone_path']
+    with tempfile.TemporaryDirectory(dir=base_dir) as temp_dir:
+        repo = init_repository(temp_dir, bare=True)
+        remote = repo.remotes.create('origin', url)
+        heads = remote.ls_remotes(callbacks=get_callbacks(url))
+
+    return {head['name']: head['oid'].hex for head in heads}
+
+
+def remote_unchanged(url: str, scanned_refs: dict):
+    """Check if the remote still points to the tips of our last scan."""
+    if not scanned_refs:
+        return False
+
+    refs = get_remote_refs(url)
+    # The default branch might have changed.
+    if refs.get('HEAD') not in scanned_refs.values():
+        return False
+
+    for name, sha in scanned_refs.items():
+        if refs.get(name) != sha:
+            return False
+
+    return True
@@ -0,0 +1,97 @@
+"""Resolve git email addresses to Github logins."""
+from github.GithubObject import NotSet
+
+from gitalizer.extensions import sentry
+from gitalizer.aggregator.github import call_github_function
+
+
+def get_login(user):
+    """Get the login of a Github user from a commit response."""
+    if not user or user is NotSet:
+        return None
+
+    # Workaround for issue https://github.com/PyGithub/PyGithub/issues/279
+    if user._url.value is None:
+        sentry.captureMessage('User has no _url', level='info')
+        return None
+
+    return user.login
+
+
+class AuthorResolver():
+    """Map email addresses to the Github logins of a single repository.
+
+    Each page of Github's commit listing contains the author and committer logins of 100 commits,
+    while a single commit lookup resolves at most two addresses.
+    All responses are memoized for the whole scan.
+    """
+
+    def __init__(self, github_repo):
+        """Create a new resolver."""
+        self.github_repo = github_repo
+        # Address -> login. `None` if Github knows the address, but no user for it.
+        self.logins = {}
+        self.fetched_commits = set()
+
+        self.listing = None
+        self.next_page = 0
+        self.listing_exhausted = False
+
+        self.api_calls = 0
+        self.resolved = 0
+
+    def resolve(self, addresses: set):
+        """Page through the commit listing, until all addresses are resolved.
+
+        Paging stops, as soon as more pages than unresolved addresses have been fetched.
+        From there on single commit lookups for the leftovers are cheaper.
+        """
+        missing = {address for address in addresses if address not in self.logins}
+        pages = 0
+        while missing and not self.listing_exhausted and pages < len(missing):
+            if self.listing is None:
+                self.listing = call_github_function(self.github_repo, 'get_commits')
+
+            page = call_github_function(self.listing, 'get_page', [self.next_page])
+            self.api_calls += 1
+            self.next_page += 1
+            pages += 1
+
+            if len(page) == 0:
+                self.listing_exhausted = True
+            for github_commit in page:
+                self.add_commit(github_commit)
+
+            missing = {address for address in missing if address not in self.logins}
+
+    def get_login(self, address: str, sha: str):
+        """Get the login for an address.
+
+        `sha` is a commit of this address, which is looked up
+        if the address didn't show up in the commit listing.
+        """
+        if address not in self.logins and sha not in self.fetched_commits:
+            github_commit = call_github_function(self.github_repo, 'get_commit', [sha])
+            self.api_calls += 1
+            self.fetched_commits.add(sha)
+            self.add_commit(github_commit)
+
+        login = self.logins.get(address)
+        if login:
+            self.resolved += 1
+        return login
+
+    def add_commit(self, github_commit):
+        """Remember the logins of the author and committer of a commit."""
+        git_commit = github_commit.commit
+        users = [
+            (git_commit.author, github_commit.author),
+            (git_commit.committer, github_commit.committer),
+        ]
+        for git_user, user in users:
+            if not git_user or not git_user.email:
+                continue
+
+            login = get_login(user)
+            if login or git_user.email not in self.logins:
+                self.logins[git_user.email] = login
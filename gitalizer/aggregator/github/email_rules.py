@@ -0,0 +1,31 @@
+"""Deterministic rules, which map email addresses to Github logins without API calls."""
+import re
+
+
+# List of (compiled pattern, fixed login) tuples.
+EMAIL_RULES = []
+
+
+def add_email_rule(pattern: str, login: str = None):
+    """Add a new rule.
+
+    The pattern has to match the whole address.
+    It either contains a `login` group or maps all matching addresses to the fixed `login`.
+    """
+    EMAIL_RULES.append((re.compile(pattern, re.IGNORECASE), login))
+
+
+def resolve_login(address: str):
+    """Get the login for an address from the first matching rule."""
+    for pattern, login in EMAIL_RULES:
+        match = pattern.fullmatch(address)
+        if match:
+            return login or match.group('login')
+
+    return None
+
+
+# Private addresses of Github users. Newer ones are prefixed with the user id.
+add_email_rule(r'(\d+\+)?(?P<login>[a-z0-9\-]+(\[bot\])?)@users\.noreply\.github\.com')
+# Commits made through the Github web interface are committed by `web-flow`.
+add_email_rule(r'noreply@github\.com', 'web-flow')
@@ -4,11 +4,12 @@ import pytz
 from datetime import datetime, timedelta
 
 from gitalizer.extensions import github, logger
-from gitalizer.models import Contributor, Organization, Repository
+from gitalizer.models import Contributor, Organization
 from gitalizer.aggregator.github import call_github_function
+from gitalizer.aggregator.github.pagination import get_all_pages
 from gitalizer.helpers.parallel import new_session
 from gitalizer.helpers.parallel.manager import Manager
-from gitalizer.aggregator.github.user import check_fork
+from gitalizer.aggregator.github.user import check_fork, get_repositories
 
 
 def get_organization_memberships():
@@ -21,15 +22,17 @@ def get_organization_memberships():
     for contributor in contributors:
         if contributor.last_full_scan and contributor.last_full_scan > now - timedelta(days=2):
             continue
-        logger.info(f'Checking {contributor.login}. {github.github.rate_limiting[0]} remaining.')
+        logger.info(f'Checking {contributor.login}. {github.rate_status()}')
 
         github_user = call_github_function(github.github, 'get_user',
                                            [contributor.login])
 
         github_orgs = call_github_function(github_user, 'get_orgs')
-        for org in github_orgs:
-            organization = Organization.get_organization(org.login, org.url, session)
-            contributor.organizations.append(organization)
+        organizations = Organization.get_organizations(
+            [{'login': org.login, 'url': org.url} for org in github_orgs],
+            session,
+        )
+        Contributor.add_to_organizations(contributor.login, organizations.keys(), session)
         contributor.last_full_scan = datetime.utcnow()
         session.add(contributor)
         session.commit()
@@ -41,39 +44,34 @@ def get_github_organization(name: str, members=False):
     orga = call_github_function(github.github, 'get_organization', [name])
 
     # Get orga repos
-    orga_repos = call_github_function(orga, 'get_repos')
-    while orga_repos ._couldGrow():
-        call_github_function(orga_repos, '_grow')
+    orga_repos = get_all_pages(call_github_function(orga, 'get_repos'))
 
     # Check orga repos
-    repos_to_scan = set()
+    # Full name -> size of all repositories to scan.
+    repos_to_scan = {}
+    repositories = get_repositories(orga_repos, session)
     for github_repo in orga_repos:
-        repository = Repository.get_or_create(
-            session,
-            github_repo.ssh_url,
-            name=github_repo.name,
-            full_name=github_repo.full_name,
-        )
+        repository = repositories.get(github_repo.ssh_url)
+        if repository is None:
+            continue
         if github_repo.fork:
             check_fork(github_repo, session, repository, repos_to_scan)
         session.add(repository)
 
-        if not repository.should_scan():
+        if not repository.should_scan(github_repo.pushed_at):
             continue
 
         session.commit()
-        repos_to_scan.add(github_repo.full_name)
+        repos_to_scan[github_repo.full_name] = github_repo.size
 
     member_list = set()
     if members:
         # Get members
-        members = call_github_function(orga, 'get_members')
-        while members._couldGrow():
-            call_github_function(members, '_grow')
+        members = get_all_pages(call_github_function(orga, 'get_members'))
         member_list = set([m.login for m in members])
 
     # Create and start manager with orga repos and memeber_list
-    sub_manager = Manager('github_repository', repos_to_scan)
+    sub_manager = Manager('github_repository', repos_to_scan, priorities=repos_to_scan)
     manager = Manager('github_contributor', member_list, sub_manager)
     manager.start()
     manager.run()
@@ -0,0 +1,53 @@
+"""Concurrent fetching of paginated Github listings."""
+import re
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+from gitalizer.helpers.config import config
+from gitalizer.extensions import github
+from gitalizer.aggregator.github import call_github_function
+
+
+def get_all_pages(listing, limit: int = None):
+    """Get all elements of a paginated listing.
+
+    The first page is fetched normally. Its `Link` header tells the number of the last page.
+    All other pages are then fetched concurrently by up to `pagination_threads` threads.
+    Returns `None`, if the listing has more than `limit` elements.
+    Other pages aren't fetched, if the first page already shows that there are too many elements.
+    """
+    per_page = github.github.per_page
+    first_page = call_github_function(listing, 'get_page', [0])
+    if len(first_page) < per_page:
+        return first_page
+
+    pages = get_last_page(first_page[0]._headers)
+    # At least one element is on the last page.
+    if limit is not None and (pages - 1) * per_page + 1 > limit:
+        return None
+
+    elements = list(first_page)
+    if pages > 1:
+        threads = min(int(config['github']['pagination_threads']), pages - 1)
+        with ThreadPoolExecutor(threads) as executor:
+            results = executor.map(
+                lambda page: call_github_function(listing, 'get_page', [page]),
+                range(1, pages),
+            )
+            for page in results:
+                elements += page
+
+    if limit is not None and len(elements) > limit:
+        return None
+
+    return elements
+
+
+def get_last_page(headers: dict):
+    """Get the amount of pages from the `Link` header of a page."""
+    match = re.search(r'<([^>]+)>;\s*rel="last"', headers.get('link', ''))
+    if match is None:
+        return 1
+
+    page = parse_qs(urlparse(match.group(1)).query).get('page')
+    return int(page[0]) if page else 1
@@ -1,10 +1,8 @@
 """Data collection from Github."""
-from time import sleep
-from random import randrange
 from datetime import datetime
 from github import GithubException
 from raven import breadcrumbs
-from pygit2 import GitError
+from pygit2 import GitError, Repository as GitRepository
 from gitalizer.helpers.config import config
 
 from gitalizer.extensions import github, sentry, logger
@@ -13,11 +11,16 @@ from gitalizer.helpers.parallel import new_session
 from gitalizer.helpers.parallel.manager import Manager
 from gitalizer.helpers.parallel.messages import error_message
 from gitalizer.aggregator.git.commit import CommitScanner
-from gitalizer.aggregator.git.repository import get_git_repository, delete_git_repository
+from gitalizer.aggregator.git.repository import (
+    get_git_repository,
+    delete_git_repository,
+    remote_unchanged,
+)
 from gitalizer.aggregator.github import (
     call_github_function,
     get_github_object,
 )
+from gitalizer.aggregator.github.pagination import get_all_pages
 
 
 def get_github_repository_by_owner_name(owner: str, name: str):
@@ -32,9 +35,7 @@ def get_github_repository_by_owner_name(owner: str, name: str):
 def get_github_repository_users(full_name: str):
     """Get all collaborators of a repository."""
     repo = call_github_function(github.github, 'get_repo', [full_name])
-    collaborators = call_github_function(repo, 'get_collaborators')
-    while collaborators._couldGrow():
-        call_github_function(collaborators, '_grow')
+    collaborators = get_all_pages(call_github_function(repo, 'get_collaborators'))
 
     collaborator_list = [c.login for c in collaborators]
 
@@ -45,13 +46,28 @@ def get_github_repository_users(full_name: str):
 
 
 def get_github_repository(full_name: str):
-    """Get all information from a single repository."""
+    """Get all information from a single repository.
+
+    This runs all stages of a repository scan in sequence.
+    """
+    response = get_repository_metadata(full_name)
+    if 'metadata' not in response:
+        return response
+
+    response = clone_github_repository(response['metadata'])
+    if 'metadata' not in response:
+        return response
+
+    return scan_github_repository(response['metadata'])
+
+
+def get_repository_metadata(full_name: str):
+    """Get the metadata of a repository and check if it needs to be scanned.
+
+    Returns a response with the `metadata` for the next stages, if the repository should be scanned.
+    """
     try:
         session = new_session()
-        # Sleep for a random time to avoid hitting the abuse detection.
-        sleeptime = randrange(1, 15)
-        sleep(sleeptime)
-
         github_repo = call_github_function(github.github, 'get_repo',
                                            [full_name], {'lazy': False})
 
@@ -61,9 +77,15 @@ def get_github_repository(full_name: str):
             name=github_repo.name,
             full_name=github_repo.full_name,
         )
+        # The size is known now, no matter if the scan succeeds.
+        repository.size = github_repo.size
+        session.add(repository)
+        session.commit()
 
         if repository.broken:
             return {'message': f'Skip broken repo {github_repo.ssh_url}'}
+        elif repository.too_big:
+            return {'message': f'Skip too big repo {github_repo.ssh_url}'}
         elif github_repo.size > int(config['aggregator']['max_repository_size']):
             repository.too_big = True
             session.add(repository)
@@ -73,15 +95,95 @@ def get_github_repository(full_name: str):
 
             return {'message': f'Repo too big (filesize): {github_repo.ssh_url}'}
 
-        current_time = datetime.now().strftime('%H:%M')
+        # Nothing has been pushed since the last scan. Skip cloning.
+        if repository.completely_scanned and \
+                remote_unchanged(github_repo.ssh_url, repository.scanned_refs):
+            repository.updated_at = datetime.now()
+            repository.pushed_at = github_repo.pushed_at
+            session.add(repository)
+            session.commit()
+
+            return {'message': f'Repo unchanged since last scan: {github_repo.ssh_url}'}
+
+        # Forks can reuse the objects of their parent.
+        parent_url = repository.parent_url
+        if parent_url is None and github_repo.fork:
+            parent = get_github_object(github_repo, 'parent')
+            parent_url = parent.ssh_url if parent else None
 
         owner = get_github_object(github_repo, 'owner')
+        metadata = {
+            'full_name': github_repo.full_name,
+            'clone_url': github_repo.ssh_url,
+            'owner': owner.login,
+            'name': github_repo.name,
+            'parent_url': parent_url,
+            'pushed_at': github_repo.pushed_at,
+            'size': github_repo.size,
+        }
+        response = {
+            'message': f'Got metadata of {github_repo.ssh_url}',
+            'metadata': metadata,
+        }
+
+    except GithubException as e:
+        response = github_error_response(session, full_name, e)
+
+    except BaseException:
+        # Catch any exception and print it, as we won't get any information due to threading otherwise.
+        sentry.captureException()
+        response = error_message('Error in get_repository:\n')
+        pass
+
+    finally:
+        session.close()
+
+    return response
+
+
+def clone_github_repository(metadata: dict):
+    """Clone a repository or update its cached clone.
+
+    Returns a response with the `metadata` and the path of the clone on success.
+    """
+    try:
         git_repo = get_git_repository(
-            github_repo.ssh_url,
-            owner.login,
-            github_repo.name,
+            metadata['clone_url'],
+            metadata['owner'],
+            metadata['name'],
+            metadata['parent_url'],
         )
-        scanner = CommitScanner(git_repo, session, github_repo)
+        metadata['git_path'] = git_repo.path
+        response = {
+            'message': f'Cloned {metadata["clone_url"]}',
+            'metadata': metadata,
+        }
+
+    except (GitError, UnicodeDecodeError):
+        delete_git_repository(metadata['owner'], metadata['name'], metadata['clone_url'])
+        response = error_message('Error in get_repository:\n')
+        pass
+
+    except BaseException:
+        # Catch any exception and print it, as we won't get any information due to threading otherwise.
+        sentry.captureException()
+        delete_git_repository(metadata['owner'], metadata['name'], metadata['clone_url'])
+        response = error_message('Error in get_repository:\n')
+        pass
+
+    return response
+
+
+def scan_github_repository(metadata: dict):
+    """Scan all commits of a cloned repository and delete the clone afterwards."""
+    try:
+        session = new_session()
+        # The metadata is already known. A lazy object doesn't need another API call.
+        github_repo = call_github_function(github.github, 'get_repo',
+                                           [metadata['full_name']], {'lazy': True})
+        git_repo = GitRepository(metadata['git_path'])
+
+        scanner = CommitScanner(git_repo, session, github_repo, metadata)
         commit_count = scanner.scan_repository()
 
         breadcrumbs.record(
@@ -89,40 +191,19 @@ def get_github_repository(full_name: str):
             category='info',
         )
 
-        repository = session.query(Repository).get(github_repo.ssh_url)
-        rate = github.github.get_rate_limit().core
-        time = rate.reset.strftime("%H:%M")
         current_time = datetime.now().strftime('%H:%M')
 
         message = f'{current_time}: '
-        message += f'Scanned {repository.clone_url} with {commit_count} commits.\n'
-        message += f'{rate.remaining} of 5000 remaining. Reset at {time}\n'
+        message += f'Scanned {metadata["clone_url"]} with {commit_count} commits.\n'
+        message += f'Resolved {scanner.resolver.resolved} emails '
+        message += f'with {scanner.resolver.api_calls} API calls '
+        message += f'and {scanner.offline_resolved} emails without API calls.\n'
+        message += f'{github.rate_status()}\n'
 
         response = {'message': message}
 
-        repository.updated_at = datetime.now()
-        session.add(repository)
-        session.commit()
-
     except GithubException as e:
-        # 451: Access denied. Repository probably gone private.
-        # 404: User or repository just got deleted
-        if e.status == 451 or e.status == 404:
-            repository = session.query(Repository) \
-                .filter(Repository.full_name == full_name) \
-                .one_or_none()
-
-            if repository:
-                repository.broken = True
-                session.add(repository)
-                session.commit()
-            response = {'message': 'Repository access blocked.'}
-        # Catch any other GithubException
-        else:
-            sentry.captureException()
-            response = error_message('Error in get_repository:\n')
-
-        pass
+        response = github_error_response(session, metadata['full_name'], e)
 
     except (GitError, UnicodeDecodeError):
         response = error_message('Error in get_repository:\n')
@@ -135,8 +216,30 @@ def get_github_repository(full_name: str):
         pass
 
     finally:
-        if 'owner' in locals() and 'github_repo' in locals():
-            delete_git_repository(owner.login, github_repo.name)
+        delete_git_repository(metadata['owner'], metadata['name'], metadata['clone_url'])
         session.close()
 
+    # Lets the manager of the staged pipeline know, which clone is gone.
+    response['task'] = metadata.get('task', metadata['full_name'])
+
     return response
+
+
+def github_error_response(session, full_name: str, error: GithubException):
+    """Handle a `GithubException` during a repository scan."""
+    # 451: Access denied. Repository probably gone private.
+    # 404: User or repository just got deleted
+    if error.status == 451 or error.status == 404:
+        repository = session.query(Repository) \
+            .filter(Repository.full_name == full_name) \
+            .one_or_none()
+
+        if repository:
+            repository.broken = True
+            session.add(repository)
+            session.commit()
+        return {'message': 'Repository access blocked.'}
+
+    # Catch any other GithubException
+    sentry.captureException()
+    return error_message('Error in get_repository:\n')
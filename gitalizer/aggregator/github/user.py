@@ -5,8 +5,9 @@ from github.GithubException import GithubException
 
 from gitalizer.helpers.config import config
 from gitalizer.models import Repository, Contributor
-from gitalizer.extensions import github, sentry, db, logger
+from gitalizer.extensions import github, sentry, db
 from gitalizer.aggregator.github import call_github_function, get_github_object
+from gitalizer.aggregator.github.pagination import get_all_pages
 from gitalizer.helpers.parallel import new_session
 from gitalizer.helpers.parallel.manager import Manager
 from gitalizer.helpers.parallel.messages import (
@@ -85,37 +86,16 @@ def get_user_repos(user_login: str, skip=True):
             return user_too_big_message(user_login)
 
         user = call_github_function(github.github, 'get_user', [user_login])
-        owned = user.get_repos()
-        starred = user.get_starred()
-        repos_to_scan = set()
-
-        # Prefetch all owned repositories
-        user_too_big = False
-        owned_repos = 0
-        while owned._couldGrow() and not user_too_big:
-            owned_repos += 1
-            call_github_function(owned, '_grow')
-
-            # Debug messages to see that the repositories are still collected.
-            if owned_repos % 100 == 0:
-                logger.info(f'{owned_repos} owned repos for user {user_login}.')
-
-            # The user is too big. Just drop him.
-            if skip and owned_repos > int(config['aggregator']['max_repositories_for_user']):
-                user_too_big = True
-
-        # Prefetch all starred repositories
-        starred_repos = 0
-        while starred._couldGrow() and not user_too_big:
-            starred_repos += 1
-            call_github_function(starred, '_grow')
-            # Debug messages to see that the repositories are still collected.
-            if starred_repos % 100 == 0:
-                logger.info(f'{starred_repos} starred repos for user {user_login}.')
-
-            # The user is too big. Just drop him.
-            if skip and starred_repos > int(config['aggregator']['max_repositories_for_user']):
-                user_too_big = True
+        # Full name -> size of all repositories to scan.
+        repos_to_scan = {}
+
+        # Listings of users with too many repositories aren't fetched at all.
+        limit = int(config['aggregator']['max_repositories_for_user']) if skip else None
+        owned = get_all_pages(user.get_repos(), limit)
+        starred = None
+        if owned is not None:
+            starred = get_all_pages(user.get_starred(), limit)
+        user_too_big = owned is None or starred is None
 
         # User has too many repositories. Flag him and return
         if user_too_big:
@@ -130,52 +110,49 @@ def get_user_repos(user_login: str, skip=True):
             session.commit()
             return user_too_big_message(user_login)
 
+        # Create all listed repositories at once.
+        repositories = get_repositories(owned + starred, session)
+
         # Check own repositories. We assume that we are collaborating in those
         for github_repo in owned:
-            repository = Repository.get_or_create(
-                session,
-                github_repo.ssh_url,
-                name=github_repo.name,
-                full_name=github_repo.full_name,
-            )
+            repository = repositories.get(github_repo.ssh_url)
+            if repository is None:
+                continue
             if github_repo.fork and not repository.is_invalid():
                 check_fork(github_repo, session, repository,
                            repos_to_scan, user_login)
             session.add(repository)
 
-            if not repository.should_scan():
+            if not repository.should_scan(github_repo.pushed_at):
                 continue
 
             session.commit()
-            repos_to_scan.add(github_repo.full_name)
+            repos_to_scan[github_repo.full_name] = github_repo.size
 
         # Check stars and if the user collaborated to them.
         for github_repo in starred:
-            repository = Repository.get_or_create(
-                session,
-                github_repo.ssh_url,
-                name=github_repo.name,
-                full_name=github_repo.full_name,
-            )
+            repository = repositories.get(github_repo.ssh_url)
+            if repository is None:
+                continue
 
             if github_repo.fork and not repository.is_invalid():
                 check_fork(github_repo, session, repository,
                            repos_to_scan, user_login)
             session.add(repository)
 
-            if not repository.should_scan():
+            if not repository.should_scan(github_repo.pushed_at):
                 continue
 
-            repos_to_scan.add(github_repo.full_name)
+            repos_to_scan[github_repo.full_name] = github_repo.size
 
         session.commit()
 
-        rate = github.github.get_rate_limit().core
         message = f'Got repositories for {user.login}. '
-        message += f'{user.login}. {rate.remaining} of 5000 remaining.'
+        message += f'{github.rate_status()}'
         response = {
             'message': message,
             'tasks': list(repos_to_scan),
+            'priorities': repos_to_scan,
         }
     except BaseException:
         # Catch any exception and print it, as we won't get any information due to threading otherwise.
@@ -191,12 +168,9 @@ def get_user_repos(user_login: str, skip=True):
     return response
 
 
-def get_user_data(user_data: tuple):
+def get_user_data(login: str):
     """Get all missing data from a user."""
     try:
-        contributor = user_data[0]
-        login = contributor.login
-
         session = new_session()
         contributor = Contributor.get_contributor(login, session, True)
 
@@ -228,15 +202,32 @@ def get_user_data(user_data: tuple):
     return response
 
 
+def get_repositories(github_repos: list, session):
+    """Get or create the repositories of a Github listing.
+
+    Returns a dict of repositories by clone url. Repositories, which clash with
+    a known repository of the same full name (e.g. after a rename), are missing.
+    """
+    return Repository.get_or_create_all(session, [{
+        'clone_url': github_repo.ssh_url,
+        'name': github_repo.name,
+        'full_name': github_repo.full_name,
+        'size': github_repo.size,
+    } for github_repo in github_repos])
+
+
 def check_fork(github_repo, session, repository, scan_list, user_login=None):
-    """Handle github_repo forks."""
+    """Handle github_repo forks.
+
+    Parents, which should be scanned, are added to `scan_list` with their size.
+    """
     # We already scanned this repository and only need to check
     # if it or its parent should be scanned
     if repository.completely_scanned:
         # Its a fork, check if the parent needs to be scanned
         if repository.fork:
             if repository.parent.should_scan():
-                scan_list.add(github_repo.parent.full_name)
+                scan_list[github_repo.parent.full_name] = github_repo.parent.size
         # Its no fork just skip and return
         else:
             return
@@ -266,7 +257,7 @@ def check_fork(github_repo, session, repository, scan_list, user_login=None):
 
         # Mark the repository as a fork and scan the parent.
         repository.fork = True
-        if parent_repository.should_scan():
-            scan_list.add(parent_repository.full_name)
+        if parent_repository.should_scan(github_repo.parent.pushed_at):
+            scan_list[parent_repository.full_name] = github_repo.parent.size
 
     session.add(repository)
@@ -3,6 +3,7 @@ import click
 from .db import db
 from .delete import delete
 from .maintenance import maintenance
+from .queue import queue
 from .organization import organization
 from .user import user
 from .repository import repository
@@ -24,6 +25,7 @@ cli.add_command(db)
 cli.add_command(scan)
 cli.add_command(delete)
 cli.add_command(maintenance)
+cli.add_command(queue)
 
 scan.add_command(user)
 scan.add_command(repository)
@@ -2,6 +2,8 @@
 import click
 
 from gitalizer.extensions import db
+from gitalizer.helpers.parallel import create_chunks
+from gitalizer.helpers.db.lookup import match_any
 from gitalizer.models import (
     Commit,
     commit_repository,
@@ -34,9 +36,9 @@ def repository(full_name):
             .all()
 
         commit_shas = [c[0] for c in commit_shas]
-        if commit_shas:
+        for chunk in create_chunks(commit_shas, 10000):
             session.query(Commit) \
-                .filter(Commit.sha.in_(commit_shas)) \
+                .filter(match_any(Commit.sha, chunk)) \
                 .delete(synchronize_session=False)
 
         session.query(Repository) \
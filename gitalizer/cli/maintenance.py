@@ -4,6 +4,9 @@ import sys
 import click
 
 from gitalizer.extensions import logger
+from gitalizer.helpers.config import config
+from gitalizer.helpers.github.response_cache import ResponseCache
+from gitalizer.aggregator.git.cache import prune_cache as prune_clone_cache
 from gitalizer.helpers.db.maintenance import (
     clean_db,
     complete_data,
@@ -64,6 +67,32 @@ def update(update_all):
         sys.exit(1)
 
 
+@click.command()
+@click.option('--max-size', default=None, type=int,
+              help='Cache size in MB. Defaults to `clone_cache_size`. Use 0 to clear the cache.')
+def prune_cache(max_size):
+    """Remove the least recently used clones from the clone cache."""
+    removed = prune_clone_cache(max_size)
+    logger.info(f'Removed {removed} cached clones.')
+
+
+@click.command()
+@click.option('--max-size', default=None, type=int,
+              help='Cache size in MB. Defaults to `response_cache_size`. Use 0 to clear the cache.')
+def prune_response_cache(max_size):
+    """Remove old and least recently used responses from the response cache."""
+    cache = ResponseCache(
+        config['github']['response_cache_path'],
+        int(config['github']['response_cache_size']),
+        int(config['github']['response_cache_max_age']),
+    )
+    removed = cache.prune(max_size)
+    cache.vacuum()
+    logger.info(f'Removed {removed} cached responses.')
+
+
 maintenance.add_command(clean)
 maintenance.add_command(complete)
 maintenance.add_command(update)
+maintenance.add_command(prune_cache)
+maintenance.add_command(prune_response_cache)
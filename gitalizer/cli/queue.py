@@ -0,0 +1,60 @@
+"""Durable task queue operations."""
+
+import sys
+import click
+
+from gitalizer.extensions import logger
+from gitalizer.helpers.parallel import new_session
+from gitalizer.helpers.parallel.job_queue import (
+    clean_queue,
+    get_queue_status,
+    work_queue,
+)
+
+
+@click.group()
+def queue():
+    """Cli wrapper for the queue command group."""
+    pass
+
+
+@click.command()
+def work():
+    """Process all jobs in the durable queue.
+
+    This can be run on several hosts against the same database.
+    Jobs of crashed or killed runs are picked up again, once their lease expires.
+    """
+    try:
+        work_queue()
+    except KeyboardInterrupt:
+        logger.info("CTRL-C Exiting Gracefully")
+        sys.exit(1)
+
+
+@click.command()
+def status():
+    """Show the amount of jobs per task type and state."""
+    session = new_session()
+    try:
+        for task_type, state, count in get_queue_status(session):
+            logger.info(f'{task_type:<20} {state:<10} {count}')
+    finally:
+        session.close()
+
+
+@click.command()
+@click.option('--failed', is_flag=True, help='Remove failed jobs as well.')
+def clean(failed):
+    """Remove finished jobs from the queue."""
+    session = new_session()
+    try:
+        removed = clean_queue(session, failed)
+        logger.info(f'Removed {removed} jobs.')
+    finally:
+        session.close()
+
+
+queue.add_command(work)
+queue.add_command(status)
+queue.add_command(clean)
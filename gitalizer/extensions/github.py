@@ -1,16 +1,144 @@
 """Simple wrapper around github that allows for lazy initilization."""
+import os
+import threading
 from github import Github as ActualGithub
 
+from gitalizer.helpers.github.pacer import Pacer
+from gitalizer.helpers.github.token_pool import TokenPool
+from gitalizer.helpers.github.response_cache import ResponseCache
+
+
+# Private attributes of PyGithub's `Requester`, which are used by the request hook.
+# They aren't part of PyGithub's API, which is why setup.py pins the PyGithub version.
+REQUESTER_ATTRIBUTES = [
+    'requestRaw',
+    'connectionClass',
+    'hostname',
+    'port',
+    'retry',
+    'timeout',
+    'verify',
+]
+
 
 class Github(object):
-    """Github wrapper class that allows single initialization."""
+    """Github wrapper class that allows single initialization.
+
+    With several `github_tokens`, there is a client for each token.
+    All clients route their requests through a shared token pool.
+    """
 
     def __init__(self, config):
         """Initialize github."""
-        if config['github']['github_token']:
-            user = config['github']['github_token']
-            password = None
+        tokens = [token.strip() for token in config['github']['github_tokens'].split(',')]
+        tokens = [token for token in tokens if token]
+        if not tokens and config['github']['github_token']:
+            tokens = [config['github']['github_token']]
+
+        if tokens:
+            credentials = [(token, None) for token in tokens]
+            authorizations = [f'token {token}' for token in tokens]
         else:
-            user = config['github']['github_user']
-            password = config['github']['github_password']
-        self.github = ActualGithub(user, password)
+            credentials = [(config['github']['github_user'], config['github']['github_password'])]
+            authorizations = [None]
+
+        # Use the biggest possible pages to save API calls on listings.
+        self.clients = [
+            ActualGithub(user, password, base_url=config['github']['api_url'], per_page=100)
+            for user, password in credentials
+        ]
+
+        self.pacer = Pacer(
+            float(config['github']['abuse_backoff']),
+            float(config['github']['max_request_interval']),
+        )
+        self.pool = TokenPool(authorizations, int(config['github']['rate_limit_reserve']))
+        self.cache = None
+        if config['github'].getboolean('response_cache_enabled'):
+            self.cache = ResponseCache(
+                config['github']['response_cache_path'],
+                int(config['github']['response_cache_size']),
+                int(config['github']['response_cache_max_age']),
+            )
+            self.cache.prune()
+        for client in self.clients:
+            hook_requests(client, self.pacer, self.pool, self.cache)
+
+    @property
+    def github(self):
+        """Get the client of the token with the most requests left."""
+        return self.clients[self.pool.best()]
+
+    def rate_status(self):
+        """Get a short description of the shared rate limit budget without an API call."""
+        remaining, limit, reset = self.pool.status()
+        if remaining < 0:
+            return 'Rate limit unknown.'
+
+        reset_time = reset.strftime('%H:%M') if reset else 'unknown'
+        status = f'{remaining} of {limit} remaining. Reset at {reset_time}'
+        if len(self.pool) > 1:
+            status += f'. {self.pool.parked()} of {len(self.pool)} tokens parked'
+        if self.cache is not None:
+            status += f'. {self.cache.status()}'
+
+        return status
+
+
+def hook_requests(client: ActualGithub, pacer: Pacer, pool: TokenPool,
+                  cache: ResponseCache = None):
+    """Send all requests of a client through the token pool, the pacer and the response cache.
+
+    PyGithub sends every request through `Requester.__requestRaw`,
+    which is replaced on the requester instance of the client.
+    Each request is sent with the token, which has the most requests left,
+    no matter which client created the Github object.
+
+    The requester shares a single connection between all threads.
+    Each thread gets its own connection instead, so threads can send requests concurrently.
+    """
+    requester = client._Github__requester
+    missing = [name for name in REQUESTER_ATTRIBUTES if not hasattr(requester, f'_Requester__{name}')]
+    if missing:
+        raise RuntimeError(f'Unsupported PyGithub version. Missing requester attributes: {missing}')
+
+    request_raw = requester._Requester__requestRaw
+    local = threading.local()
+
+    def get_connection():
+        # Forked processes get new connections as well.
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = requester._Requester__connectionClass(
+                requester._Requester__hostname,
+                requester._Requester__port,
+                retry=requester._Requester__retry,
+                timeout=requester._Requester__timeout,
+                verify=requester._Requester__verify,
+            )
+            local.pid = os.getpid()
+
+        return local.connection
+
+    def paced_request_raw(cnx, verb, url, request_headers, input):
+        token = pool.acquire()
+        pool.prepare(token, request_headers)
+        cached = None
+        if cache is not None and verb == 'GET':
+            cached = cache.prepare(url, request_headers)
+
+        pacer.wait()
+        status, response_headers, output = request_raw(
+            cnx or get_connection(), verb, url, request_headers, input)
+        # Responses to conditional requests don't count against the rate limit.
+        if cached is not None and status == 304:
+            pool.release(token)
+        pool.update(token, response_headers)
+        pacer.observe(status, response_headers, output)
+
+        if cache is not None and verb == 'GET':
+            status, response_headers, output = cache.handle(
+                url, request_headers, cached, status, response_headers, output)
+
+        return status, response_headers, output
+
+    requester._Requester__requestRaw = paced_request_raw
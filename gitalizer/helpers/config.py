@@ -9,7 +9,10 @@ def read_config():
     path = os.path.expanduser('~/.config/gitalizer.ini')
     path = os.path.realpath(path)
     config = configparser.ConfigParser()
-    # Try to get configuration file and return it
+    set_defaults(config)
+
+    # Try to get configuration file and return it.
+    # Options missing in older configuration files fall back to the defaults.
     # If this doesn't work, a new default config file will be created
     if os.path.exists(path):
         try:
@@ -19,6 +22,15 @@ def read_config():
             print('Error while parsing config file')
             raise Exception
 
+    with open(path, 'w') as fd:
+        config.write(fd)
+
+    print('Initialized empty configuration. Please adjust before proceeding.')
+    sys.exit(0)
+
+
+def set_defaults(config):
+    """Populate the configuration with default values."""
     config['develop'] = {
         'log_dir': './logs',
         'sentry_token': '',
@@ -28,6 +40,17 @@ def read_config():
         'github_user': 'git',
         'github_password': '',
         'github_token': '',
+        'github_tokens': '',
+        'api_url': 'https://api.github.com',
+        'abuse_backoff': 60,
+        'max_request_interval': 30,
+        'rate_limit_reserve': 10,
+        'response_cache_enabled': 'no',
+        'response_cache_path': '~/.cache/gitalizer_responses.sqlite',
+        # Size in MB.
+        'response_cache_size': 1024,
+        'response_cache_max_age': 30 * 24 * 60 * 60,
+        'pagination_threads': 4,
     }
     config['cloning'] = {
         'ssh_user': '',
@@ -35,14 +58,37 @@ def read_config():
         'private_key': '/home/user/.ssh/id_rsa',
         'public_key': '/home/user/.ssh/id_rsa.pub',
         'temporary_clone_path': '/tmp/gitalizer',
+        'clone_cache_enabled': 'no',
+        'clone_cache_path': '/tmp/gitalizer_cache',
+        'clone_cache_size': 20 * 1024,
     }
     config['aggregator'] = {
         'git_user_scan_threads': 4,
         'git_commit_scan_threads': 4,
         'max_repository_size': 4 * 1024 * 1024,
         'max_repositories_for_user': 3000,
+        'max_repository_commits': 100000,
         'repository_rescan_interval': 21 * 24 * 60 * 60,
         'contributor_rescan_interval': 22 * 24 * 60 * 60,
+        'commit_batch_size': 1000,
+        # Keeps the shas of all commits in memory: 20 bytes per commit in the database.
+        # It is loaded once before forking and shared by all scan workers.
+        'known_commit_filter': 'no',
+        'known_commit_filter_refresh': 60 * 60,
+        'writer_process': 'no',
+        'writer_transaction_batches': 10,
+        # Scan workers block, while this many batches wait for the writer.
+        'writer_queue_size': 50,
+        'largest_tasks_first': 'yes',
+        'staged_pipeline': 'no',
+        'metadata_threads': 1,
+        'clone_threads': 2,
+        'clone_prefetch': 4,
+        'clone_prefetch_size': 2 * 1024,
+        'durable_queue': 'no',
+        # Workers renew the lease of their job every third of the lease.
+        'job_lease': 6 * 60 * 60,
+        'job_max_attempts': 3,
     }
 
     config['database'] = {
@@ -53,11 +99,5 @@ def read_config():
         'plot_dir': './plots',
     }
 
-    with open(path, 'w') as fd:
-        config.write(fd)
-
-    print('Initialized empty configuration. Please adjust before proceeding.')
-    sys.exit(0)
-
 
 config = read_config()
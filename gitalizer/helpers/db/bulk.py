@@ -0,0 +1,60 @@
+"""Bulk writes, which bypass the ORM for large amounts of rows."""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects.postgresql import insert
+
+from gitalizer.models.commit import Commit, commit_repository
+from gitalizer.helpers.parallel import create_chunks
+
+
+# Compact representation of a git commit.
+# Times are unix timestamps, offsets are utc offsets in minutes.
+CommitRecord = namedtuple('CommitRecord', [
+    'sha',
+    'creation_time',
+    'creation_time_offset',
+    'commit_time',
+    'commit_time_offset',
+    'additions',
+    'deletions',
+    'author_email_address',
+    'committer_email_address',
+])
+
+
+def insert_ignore(session, table, rows: list, chunk_size: int = 1000):
+    """Insert rows with multi-row INSERT statements.
+
+    Rows which violate a unique constraint already exist and are skipped.
+    This allows several workers to write the same rows without IntegrityErrors.
+    """
+    for chunk in create_chunks(rows, chunk_size):
+        statement = insert(table).values(chunk).on_conflict_do_nothing()
+        session.execute(statement)
+
+
+def insert_commits(session, records: list):
+    """Insert new commits from `CommitRecord`s."""
+    rows = []
+    for record in records:
+        creation_offset = timedelta(minutes=record.creation_time_offset)
+        commit_offset = timedelta(minutes=record.commit_time_offset)
+        rows.append({
+            'sha': record.sha,
+            'creation_time': datetime.fromtimestamp(record.creation_time, timezone(creation_offset)),
+            'creation_time_offset': creation_offset,
+            'commit_time': datetime.fromtimestamp(record.commit_time, timezone(commit_offset)),
+            'commit_time_offset': commit_offset,
+            'additions': record.additions,
+            'deletions': record.deletions,
+            'author_email_address': record.author_email_address,
+            'committer_email_address': record.committer_email_address,
+        })
+
+    insert_ignore(session, Commit.__table__, rows)
+
+
+def link_commits(session, shas: list, clone_url: str):
+    """Add commits to a repository."""
+    rows = [{'commit_sha': sha, 'repository_clone_url': clone_url} for sha in shas]
+    insert_ignore(session, commit_repository, rows)
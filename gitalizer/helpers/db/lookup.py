@@ -0,0 +1,26 @@
+"""Lookups for large amounts of keys."""
+from sqlalchemy import any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from gitalizer.helpers.parallel import create_chunks
+
+
+def match_any(column, keys: list):
+    """Create a `column = ANY(:keys)` clause.
+
+    All keys are sent as a single array parameter. In contrast to an IN list,
+    the statement doesn't grow with the amount of keys and is planned as a single array comparison.
+    """
+    return column == any_(bindparam('keys', list(keys), type_=ARRAY(column.type), unique=True))
+
+
+def bulk_lookup(query, column, keys: list, chunk_size: int = 10000):
+    """Get all rows of a query, whose `column` matches one of the keys.
+
+    The keys are split into chunks to keep single statements reasonably small.
+    """
+    results = []
+    for chunk in create_chunks(list(keys), chunk_size):
+        results += query.filter(match_any(column, chunk)).all()
+
+    return results
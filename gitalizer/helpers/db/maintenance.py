@@ -69,10 +69,10 @@ def complete_repos():
         .all()
     logger.info(f'Found {len(repos)}')
 
-    full_names = [r.full_name for r in repos]
-    repos_to_scan = set(full_names)
+    # Full name -> size of all repositories to scan.
+    repos_to_scan = {r.full_name: r.size or 0 for r in repos}
 
-    manager = Manager('github_repository', repos_to_scan)
+    manager = Manager('github_repository', repos_to_scan, priorities=repos_to_scan)
     manager.start()
     manager.run()
 
@@ -122,6 +122,7 @@ def update_contributors(update_all):
             if count % 5000 == 0:
                 logger.info(f'Found {count} contributors ({len(contributors_to_scan)} big)')
 
-    manager = ListManager('github_user', contributors_to_scan)
+    logins = [contributor.login for contributor, _ in contributors_to_scan]
+    manager = ListManager('github_user', logins)
     manager.start()
     manager.run()
@@ -0,0 +1,108 @@
+"""Compact in-memory sets of commit shas."""
+import time
+from bisect import bisect_left
+from sqlalchemy import func
+
+from gitalizer.helpers.config import config
+from gitalizer.models.commit import Commit
+
+
+class ShaSet():
+    """A sorted array of 20 byte sha digests.
+
+    This needs 20 bytes per sha, while a python set of hex strings needs about 100.
+    Lookups are done by binary search.
+    """
+
+    def __init__(self, digests: bytes = b''):
+        """Create a new set from sorted and concatenated digests."""
+        self.digests = digests
+
+    @staticmethod
+    def from_query(query, count: int = None):
+        """Build a set from a query, which returns hex shas ordered by sha.
+
+        With the expected `count` of rows, the digests are written into a preallocated buffer,
+        which avoids copying the whole set at the end.
+        """
+        if count is None:
+            digests = bytearray()
+            for row in query.yield_per(10000):
+                digests += bytes.fromhex(row[0])
+            return ShaSet(bytes(digests))
+
+        digests = bytearray(count * 20)
+        index = 0
+        for row in query.yield_per(10000):
+            if index < count:
+                digests[index*20:(index+1)*20] = bytes.fromhex(row[0])
+            else:
+                # Rows have been added since counting.
+                digests += bytes.fromhex(row[0])
+            index += 1
+
+        # Rows have been deleted since counting.
+        del digests[index*20:]
+        return ShaSet(digests)
+
+    def __len__(self):
+        """Get the amount of shas."""
+        return len(self.digests) // 20
+
+    def __getitem__(self, index):
+        """Get the digest at a specific index."""
+        return self.digests[index*20:(index+1)*20]
+
+    def __contains__(self, sha):
+        """Check if a sha is in this set. Accepts hex strings and raw digests."""
+        if isinstance(sha, str):
+            sha = bytes.fromhex(sha)
+        index = bisect_left(self, sha)
+        return index < len(self) and self[index] == sha
+
+
+known_commits = None
+known_commits_loaded_at = 0
+# The set has been loaded before the workers were forked.
+known_commits_shared = False
+
+
+def query_known_commits(session):
+    """Get a `ShaSet` of all commits in the database."""
+    count = session.query(func.count(Commit.sha)).scalar()
+    # Hex shas sort like their digests in the C collation.
+    query = session.query(Commit.sha).order_by(Commit.sha.collate('C'))
+    return ShaSet.from_query(query, count)
+
+
+def load_known_commits(session):
+    """Load the set of all commits before the workers are forked.
+
+    Forked workers share the set copy-on-write instead of loading their own copy.
+    They don't refresh it, as a refresh would create a private copy in each worker.
+    """
+    global known_commits, known_commits_loaded_at, known_commits_shared
+
+    known_commits = query_known_commits(session)
+    known_commits_loaded_at = time.time()
+    known_commits_shared = True
+
+
+def get_known_commits(session):
+    """Get a `ShaSet` of all commits in the database.
+
+    Unless the set has been loaded before forking, it is cached per process and
+    reloaded after `known_commit_filter_refresh` seconds.
+    As other workers keep adding commits, a missing sha doesn't mean the commit is unknown.
+    """
+    global known_commits, known_commits_loaded_at
+
+    if known_commits_shared:
+        return known_commits
+
+    refresh_interval = int(config['aggregator']['known_commit_filter_refresh'])
+    if known_commits is None or known_commits_loaded_at < time.time() - refresh_interval:
+        known_commits = query_known_commits(session)
+        known_commits_loaded_at = time.time()
+
+    return known_commits
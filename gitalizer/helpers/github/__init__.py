@@ -0,0 +1 @@
+"""Coordination of Github API requests between threads and processes."""
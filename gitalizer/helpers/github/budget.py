@@ -0,0 +1,90 @@
+"""A rate limit budget shared by all processes."""
+import time
+import multiprocessing
+from datetime import datetime
+
+
+class RateBudget():
+    """Shared counter of the remaining Github rate limit.
+
+    The counter is fed passively from the rate limit headers of all responses.
+    Every request takes one unit from the budget before it is sent. Once only the
+    `reserve` is left, all processes block until the rate limit is reset,
+    instead of running into rate limit errors one by one.
+    """
+
+    def __init__(self, reserve: int):
+        """Create a new budget. The budget is unknown until the first response."""
+        self.reserve = reserve
+        self.lock = multiprocessing.Lock()
+        self.remaining = multiprocessing.Value('i', -1, lock=False)
+        self.limit = multiprocessing.Value('i', -1, lock=False)
+        # Unix timestamp of the next reset.
+        self.reset = multiprocessing.Value('d', 0.0, lock=False)
+
+    def acquire(self):
+        """Take a request from the budget. Blocks until the reset, if the budget is used up."""
+        while not self.try_acquire():
+            time.sleep(self.wait_time())
+
+    def try_acquire(self):
+        """Take a request from the budget, if there is one left."""
+        with self.lock:
+            self.expire()
+            if self.remaining.value < 0:
+                return True
+            if self.remaining.value > self.reserve:
+                self.remaining.value -= 1
+                return True
+
+            return False
+
+    def release(self):
+        """Give back a request, which didn't count against the rate limit."""
+        with self.lock:
+            if self.remaining.value >= 0:
+                self.remaining.value += 1
+
+    def available(self):
+        """Get the amount of requests above the reserve. `None` if the budget is unknown."""
+        with self.lock:
+            self.expire()
+            if self.remaining.value < 0:
+                return None
+
+            return max(self.remaining.value - self.reserve, 0)
+
+    def wait_time(self):
+        """Get the seconds until the budget is reset."""
+        with self.lock:
+            return max(self.reset.value - time.time() + 1, 0)
+
+    def expire(self):
+        """Forget the budget, once the rate limit has been reset. Must be called with the lock."""
+        # The next response tells the new budget.
+        if self.reset.value and time.time() >= self.reset.value:
+            self.remaining.value = -1
+            self.reset.value = 0.0
+
+    def update(self, headers: dict):
+        """Update the budget from the rate limit headers of a response."""
+        if 'x-ratelimit-remaining' not in headers or 'x-ratelimit-reset' not in headers:
+            return
+
+        remaining = int(headers['x-ratelimit-remaining'])
+        reset = float(headers['x-ratelimit-reset'])
+        with self.lock:
+            if 'x-ratelimit-limit' in headers:
+                self.limit.value = int(headers['x-ratelimit-limit'])
+            # Responses of the same window arrive out of order. The lowest count is the latest.
+            if reset == self.reset.value and self.remaining.value >= 0:
+                self.remaining.value = min(self.remaining.value, remaining)
+            elif reset >= self.reset.value:
+                self.remaining.value = remaining
+                self.reset.value = reset
+
+    def status(self):
+        """Get the remaining requests, the limit and the time of the next reset."""
+        with self.lock:
+            reset = datetime.fromtimestamp(self.reset.value) if self.reset.value else None
+            return self.remaining.value, self.limit.value, reset
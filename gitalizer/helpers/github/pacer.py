@@ -0,0 +1,64 @@
+"""Adaptive spacing of Github API requests."""
+import time
+import multiprocessing
+
+
+class Pacer():
+    """Spaces Github API requests of all processes, based on Github's responses.
+
+    As long as Github doesn't push back, requests aren't delayed at all.
+    `Retry-After` headers and abuse detection responses pause all requests.
+    Repeated abuse detection doubles the spacing of requests,
+    while successful responses let it decay again.
+
+    Exhausted rate limits are handled per token by the token pool.
+
+    The state lives in shared memory and is inherited by forked worker processes.
+    """
+
+    def __init__(self, backoff: float, max_interval: float):
+        """Create a new pacer."""
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.lock = multiprocessing.Lock()
+        # Earliest time of the next request.
+        self.next_request = multiprocessing.Value('d', 0.0, lock=False)
+        # Spacing between two requests.
+        self.interval = multiprocessing.Value('d', 0.0, lock=False)
+
+    def wait(self):
+        """Wait until the next request may be sent."""
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_request.value)
+            self.next_request.value = start + self.interval.value
+
+        if start > now:
+            time.sleep(start - now)
+
+    def pause(self, seconds: float):
+        """Don't send any requests for some time."""
+        with self.lock:
+            resume = time.time() + seconds
+            self.next_request.value = max(self.next_request.value, resume)
+
+    def observe(self, status: int, headers: dict, output):
+        """Adapt the spacing to a response."""
+        retry_after = headers.get('retry-after')
+        message = str(output).lower()
+        abuse = status == 403 and ('abuse' in message or 'secondary rate limit' in message)
+
+        if retry_after or abuse:
+            with self.lock:
+                interval = min(max(self.interval.value * 2, 1.0), self.max_interval)
+                self.interval.value = interval
+            try:
+                seconds = float(retry_after)
+            except (TypeError, ValueError):
+                seconds = self.backoff
+            self.pause(seconds)
+
+        elif status < 400 and self.interval.value > 0:
+            with self.lock:
+                interval = self.interval.value * 0.9
+                self.interval.value = interval if interval > 0.01 else 0.0
@@ -0,0 +1,194 @@
+"""A persistent cache of Github API responses for conditional requests."""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import multiprocessing
+
+
+# Each thread prunes the cache after this many new responses.
+PRUNE_INTERVAL = 1000
+
+
+class ResponseCache():
+    """Cache of Github API responses, which is stored in a sqlite database.
+
+    GET requests are sent with the `ETag` and `Last-Modified` of the cached response.
+    Github answers with `304 Not Modified`, if nothing changed. Those responses
+    don't count against the rate limit and the cached response is used instead.
+
+    Responses are cached per URL and token, as they depend on the permissions of the token.
+    Tokens are only stored as a hash.
+
+    Responses, which haven't been used for `max_age` seconds, are removed.
+    Beyond that, the least recently used responses are removed until the cache fits into `max_size` MB.
+    """
+
+    def __init__(self, path: str, max_size: int, max_age: int):
+        """Create the cache database, if it doesn't exist yet."""
+        self.path = os.path.realpath(os.path.expanduser(path))
+        self.max_size = max_size
+        self.max_age = max_age
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Connections can't be shared between threads or processes.
+        self.local = threading.local()
+
+        # Counters of all processes.
+        self.hits = multiprocessing.Value('i', 0)
+        self.misses = multiprocessing.Value('i', 0)
+        self.bytes_saved = multiprocessing.Value('q', 0)
+
+        connection = self.connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        # Caches of older versions don't know when their responses were used.
+        columns = [row[1] for row in connection.execute('PRAGMA table_info(response)')]
+        if columns and 'used_at' not in columns:
+            connection.execute('DROP TABLE response')
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS response (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT NOT NULL,
+                body BLOB,
+                size INTEGER NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        connection.execute('CREATE INDEX IF NOT EXISTS ix_response_used_at ON response (used_at)')
+        connection.commit()
+
+    def connection(self):
+        """Get the connection of the current thread."""
+        if getattr(self.local, 'pid', None) != os.getpid():
+            self.local.connection = sqlite3.connect(self.path, timeout=30)
+            self.local.pid = os.getpid()
+
+        return self.local.connection
+
+    @staticmethod
+    def get_key(url: str, headers: dict):
+        """Get the cache key of a request."""
+        authorization = headers.get('Authorization') or ''
+        return hashlib.sha256(f'{authorization} {url}'.encode('utf-8')).hexdigest()
+
+    def prepare(self, url: str, headers: dict):
+        """Add the conditional headers of a cached response to a request.
+
+        Returns the cached response or `None`.
+        """
+        headers.pop('If-None-Match', None)
+        headers.pop('If-Modified-Since', None)
+        try:
+            entry = self.connection().execute(
+                'SELECT etag, last_modified, headers, body FROM response WHERE key = ?',
+                (self.get_key(url, headers),),
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+
+        if entry is None:
+            return None
+
+        etag, last_modified, cached_headers, body = entry
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        return json.loads(cached_headers), body
+
+    def handle(self, url: str, request_headers: dict, cached, status: int, headers: dict, output):
+        """Serve a cached response on `304 Not Modified` or cache a new response.
+
+        Returns the response, which is passed on to PyGithub.
+        """
+        if status == 304 and cached is not None:
+            cached_headers, body = cached
+            # Keep the current rate limit headers.
+            cached_headers.update(headers)
+            try:
+                connection = self.connection()
+                connection.execute(
+                    'UPDATE response SET used_at = ? WHERE key = ?',
+                    (time.time(), self.get_key(url, request_headers)),
+                )
+                connection.commit()
+            except sqlite3.Error:
+                pass
+            with self.hits.get_lock():
+                self.hits.value += 1
+            with self.bytes_saved.get_lock():
+                self.bytes_saved.value += len(body or '')
+
+            return 200, cached_headers, body
+
+        with self.misses.get_lock():
+            self.misses.value += 1
+
+        if status == 200 and ('etag' in headers or 'last-modified' in headers):
+            cached_headers = json.dumps(headers)
+            try:
+                connection = self.connection()
+                connection.execute(
+                    'INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (self.get_key(url, request_headers), headers.get('etag'),
+                     headers.get('last-modified'), cached_headers, output,
+                     len(cached_headers) + len(output or ''), time.time()),
+                )
+                connection.commit()
+            except sqlite3.Error:
+                pass
+
+            self.local.stored = getattr(self.local, 'stored', 0) + 1
+            if self.local.stored % PRUNE_INTERVAL == 0:
+                self.prune()
+
+        return status, headers, output
+
+    def prune(self, max_size: int = None):
+        """Remove old and least recently used responses, until the cache fits into its budget.
+
+        `max_size` is the budget in MB and defaults to the size of the cache.
+        Returns the amount of removed responses.
+        """
+        if max_size is None:
+            max_size = self.max_size
+        max_size = max_size * 1024 * 1024
+
+        try:
+            connection = self.connection()
+            removed = connection.execute(
+                'DELETE FROM response WHERE used_at < ?',
+                (time.time() - self.max_age,),
+            ).rowcount
+
+            total_size = connection.execute('SELECT SUM(size) FROM response').fetchone()[0] or 0
+            if total_size > max_size:
+                # Oldest entries first
+                entries = connection.execute('SELECT key, size FROM response ORDER BY used_at')
+                keys = []
+                for key, size in entries:
+                    if total_size <= max_size:
+                        break
+                    keys.append((key,))
+                    total_size -= size
+                connection.executemany('DELETE FROM response WHERE key = ?', keys)
+                removed += len(keys)
+
+            connection.commit()
+        except sqlite3.Error:
+            return 0
+
+        return removed
+
+    def vacuum(self):
+        """Give the space of removed responses back to the file system."""
+        self.connection().execute('VACUUM')
+
+    def status(self):
+        """Get a short description of the cache statistics."""
+        saved = self.bytes_saved.value / 1024 / 1024
+        return f'Cache: {self.hits.value} hits, {self.misses.value} misses, {saved:.1f} MB saved'
@@ -0,0 +1,97 @@
+"""Routing of Github API requests between several tokens."""
+import time
+
+from gitalizer.helpers.github.budget import RateBudget
+
+
+class TokenPool():
+    """Several Github tokens, each with its own rate limit budget.
+
+    Every request is sent with the token, which has the most requests left.
+    Tokens, whose budget is used up, are parked until their rate limit is reset.
+    Requests only block, if all tokens are parked.
+
+    `authorizations` are the values of the `Authorization` header for each token.
+    A single `None` keeps the credentials of the client as they are.
+    """
+
+    def __init__(self, authorizations: list, reserve: int):
+        """Create a new pool with an unknown budget for each token."""
+        self.authorizations = authorizations
+        self.budgets = [RateBudget(reserve) for _ in authorizations]
+
+    def ranking(self):
+        """Get the indices of all tokens, which aren't parked. Most requests left first.
+
+        Tokens with an unknown budget haven't been used in this rate limit window and go first.
+        """
+        available = []
+        for index, budget in enumerate(self.budgets):
+            requests = budget.available()
+            if requests is None:
+                requests = float('inf')
+            if requests > 0:
+                available.append((requests, index))
+
+        return [index for _, index in sorted(available, key=lambda item: -item[0])]
+
+    def best(self):
+        """Get the index of the token with the most requests left."""
+        ranking = self.ranking()
+        return ranking[0] if ranking else 0
+
+    def acquire(self):
+        """Take a request from the best token and return its index.
+
+        Blocks until the first reset, if all tokens are parked.
+        """
+        while True:
+            # Another process might take the last request of a token in the meantime.
+            for index in self.ranking():
+                if self.budgets[index].try_acquire():
+                    return index
+
+            wait = min(budget.wait_time() for budget in self.budgets)
+            time.sleep(max(wait, 1))
+
+    def prepare(self, index: int, headers: dict):
+        """Send a request with the token of the given index."""
+        authorization = self.authorizations[index]
+        if authorization is not None:
+            headers['Authorization'] = authorization
+
+    def update(self, index: int, headers: dict):
+        """Update the budget of a token from the rate limit headers of a response."""
+        self.budgets[index].update(headers)
+
+    def release(self, index: int):
+        """Give a request back to the budget of a token."""
+        self.budgets[index].release()
+
+    def status(self):
+        """Get the remaining requests and the limit of all known tokens and the time of the next reset."""
+        known = False
+        remaining = limit = 0
+        resets = []
+        for budget in self.budgets:
+            token_remaining, token_limit, token_reset = budget.status()
+            if token_remaining < 0:
+                continue
+            known = True
+            remaining += token_remaining
+            limit += token_limit
+            if token_reset is not None:
+                resets.append(token_reset)
+
+        if not known:
+            return -1, -1, None
+
+        return remaining, limit, min(resets) if resets else None
+
+    def parked(self):
+        """Get the amount of parked tokens."""
+        return len(self.budgets) - len(self.ranking())
+
+    def __len__(self):
+        """Get the amount of tokens."""
+        return len(self.budgets)
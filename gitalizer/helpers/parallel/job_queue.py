@@ -0,0 +1,325 @@
+"""A durable task queue, which is stored in the database.
+
+Jobs are claimed with `SELECT ... FOR UPDATE SKIP LOCKED`.
+This allows any amount of workers on any host to share the same queue.
+Workers renew the lease of their job, until it is finished.
+"""
+import time
+import threading
+import traceback
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_, func
+from sqlalchemy.dialects.postgresql import insert
+
+from gitalizer.extensions import sentry, logger
+from gitalizer.helpers.config import config
+from gitalizer.helpers.parallel import new_session, create_chunks, writer
+from gitalizer.helpers.parallel.task import Task
+from gitalizer.helpers.db.sha_set import load_known_commits
+from gitalizer.models import Job
+
+
+def durable_queue_enabled():
+    """Check if tasks should be queued in the database."""
+    return config['aggregator'].getboolean('durable_queue')
+
+
+def enqueue(session, task_type: str, tasks: list,
+            sub_task_type: str = None, priorities: dict = None):
+    """Add jobs to the queue.
+
+    Jobs, which are already queued or running, are skipped. Finished jobs are queued again.
+    `priorities` maps tasks to priorities. Jobs with a higher priority are claimed first.
+    """
+    priorities = priorities or {}
+    rows = [{
+        'task_type': task_type,
+        'task': task,
+        'sub_task_type': sub_task_type,
+        'priority': priorities.get(task, 0),
+    } for task in set(tasks)]
+
+    for chunk in create_chunks(rows, 1000):
+        statement = insert(Job.__table__).values(chunk)
+        statement = statement.on_conflict_do_update(
+            index_elements=['task_type', 'task'],
+            set_={
+                'state': 'queued',
+                'attempts': 0,
+                'sub_task_type': statement.excluded.sub_task_type,
+                'priority': statement.excluded.priority,
+                'updated_at': func.now(),
+            },
+            where=Job.__table__.c.state.in_(['done', 'failed']),
+        )
+        session.execute(statement)
+    session.commit()
+
+
+def claim_job(session, task_types: list):
+    """Claim the next queued job of the given task types.
+
+    Running jobs with an expired lease have been abandoned and are claimed again.
+    Returns `None` if there is nothing to do.
+    """
+    lease = int(config['aggregator']['job_lease'])
+    max_attempts = int(config['aggregator']['job_max_attempts'])
+    now = datetime.now(timezone.utc)
+
+    while True:
+        job = session.query(Job) \
+            .filter(Job.task_type.in_(task_types)) \
+            .filter(or_(
+                Job.state == 'queued',
+                and_(Job.state == 'running', Job.lease_expires_at < now),
+            )) \
+            .order_by(Job.priority.desc(), Job.id) \
+            .with_for_update(skip_locked=True) \
+            .first()
+
+        if job is None:
+            session.commit()
+            return None
+
+        # The job has crashed its workers too often.
+        if job.attempts >= max_attempts:
+            job.state = 'failed'
+            job.updated_at = now
+            session.commit()
+            continue
+
+        job.state = 'running'
+        job.attempts += 1
+        job.lease_expires_at = now + timedelta(seconds=lease)
+        job.updated_at = now
+        session.commit()
+
+        return job
+
+
+def finish_job(session, job, result: dict):
+    """Store the result of a job and queue its sub tasks.
+
+    Failed jobs are queued again, until they reach `job_max_attempts`.
+    """
+    max_attempts = int(config['aggregator']['job_max_attempts'])
+    job.message = result['message']
+    job.lease_expires_at = None
+    job.updated_at = datetime.now(timezone.utc)
+    if 'error' in result:
+        job.state = 'queued' if job.attempts < max_attempts else 'failed'
+    else:
+        job.state = 'done'
+    session.commit()
+
+    if job.state == 'done' and job.sub_task_type and result.get('tasks'):
+        enqueue(session, job.sub_task_type, result['tasks'], priorities=result.get('priorities'))
+
+
+def renew_lease(session, job_id: int, attempts: int):
+    """Extend the lease of a running job.
+
+    Returns `False`, if the job has been claimed by another worker in the meantime.
+    """
+    lease = int(config['aggregator']['job_lease'])
+    now = datetime.now(timezone.utc)
+    renewed = session.query(Job) \
+        .filter(Job.id == job_id) \
+        .filter(Job.state == 'running') \
+        .filter(Job.attempts == attempts) \
+        .update({
+            'lease_expires_at': now + timedelta(seconds=lease),
+            'updated_at': now,
+        }, synchronize_session=False)
+    session.commit()
+
+    return renewed > 0
+
+
+class LeaseHeartbeat(threading.Thread):
+    """Renews the lease of a job in the background, while a worker processes it.
+
+    Abandoned jobs are only claimed again, once their worker stopped renewing the lease.
+    """
+
+    def __init__(self, job_id: int, attempts: int, interval: float = None):
+        """Create a heartbeat. The lease is renewed three times per lease by default."""
+        threading.Thread.__init__(self, daemon=True)
+        self.job_id = job_id
+        self.attempts = attempts
+        if interval is None:
+            interval = int(config['aggregator']['job_lease']) / 3
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Renew the lease until the heartbeat is stopped."""
+        session = new_session()
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    if not renew_lease(session, self.job_id, self.attempts):
+                        logger.info(f'Lost the lease of job {self.job_id}')
+                        return
+                except BaseException:
+                    sentry.captureException()
+                    session.rollback()
+        finally:
+            session.close()
+
+    def stop(self):
+        """Stop renewing the lease."""
+        self.stopped.set()
+        self.join()
+
+
+def release_job(session, job):
+    """Put a claimed job back into the queue."""
+    job.state = 'queued'
+    job.attempts -= 1
+    job.lease_expires_at = None
+    session.commit()
+
+
+def queue_is_empty(session, task_types: list, run_task_types: list = None):
+    """Check if there are no queued or running jobs left for some task types.
+
+    Jobs of the other task types in `run_task_types` count as well, if they queue sub tasks
+    of `task_types`. Jobs of task types, which aren't processed in this run, are ignored.
+    """
+    run_task_types = run_task_types or task_types
+    pending = session.query(Job.id) \
+        .filter(Job.state.in_(['queued', 'running'])) \
+        .filter(or_(
+            Job.task_type.in_(task_types),
+            and_(Job.task_type.in_(run_task_types), Job.sub_task_type.in_(task_types)),
+        )) \
+        .first()
+    session.commit()
+
+    return pending is None
+
+
+class JobWorker(multiprocessing.Process):
+    """A worker, which processes jobs from the durable queue.
+
+    The worker stops as soon as there are no queued or running jobs of its task types left.
+    While jobs of other task types in `run_task_types` are running, it waits for new sub tasks.
+    """
+
+    def __init__(self, task_types: list, write_queue=None, run_task_types: list = None):
+        """Create a new worker."""
+        multiprocessing.Process.__init__(self)
+        self.task_types = task_types
+        self.write_queue = write_queue
+        self.run_task_types = run_task_types or task_types
+
+    def run(self):
+        """Process jobs until the queue is empty."""
+        # Scan results are sent to the writer process, if there is one.
+        writer.write_queue = self.write_queue
+        session = new_session()
+        job = None
+        try:
+            while True:
+                job = claim_job(session, self.task_types)
+                if job is None:
+                    if queue_is_empty(session, self.task_types, self.run_task_types):
+                        break
+                    time.sleep(5)
+                    continue
+
+                heartbeat = LeaseHeartbeat(job.id, job.attempts)
+                heartbeat.start()
+                try:
+                    result = Task(job.task_type, job.task)()
+                except BaseException:
+                    sentry.captureException()
+                    result = {
+                        'message': f'Error in job {job.task_type} {job.task}',
+                        'error': traceback.format_exc(),
+                    }
+                finally:
+                    heartbeat.stop()
+
+                logger.info(result['message'])
+                if 'error' in result:
+                    logger.info(result['error'])
+                finish_job(session, job, result)
+                job = None
+        except KeyboardInterrupt:
+            if job is not None:
+                release_job(session, job)
+        finally:
+            session.close()
+
+
+def preload_known_commits():
+    """Load the commit filter, so forked workers share it."""
+    session = new_session()
+    try:
+        load_known_commits(session)
+    finally:
+        session.close()
+
+
+def start_job_workers(task_types: list, count: int, write_queue=None,
+                      run_task_types: list = None):
+    """Start `count` job workers for some task types.
+
+    `run_task_types` are all task types, which are processed by workers of this run.
+    """
+    workers = [JobWorker(task_types, write_queue, run_task_types) for _ in range(count)]
+    for worker in workers:
+        worker.start()
+
+    return workers
+
+
+def work_queue():
+    """Process the durable queue with workers for all task types, until it is empty."""
+    user_threads = int(config['aggregator']['git_user_scan_threads'])
+    commit_threads = int(config['aggregator']['git_commit_scan_threads'])
+
+    write_queue = None
+    writer_process = None
+    if config['aggregator'].getboolean('writer_process'):
+        write_queue = multiprocessing.Queue(int(config['aggregator']['writer_queue_size']))
+        writer_process = writer.Writer(write_queue)
+        writer_process.start()
+
+    run_task_types = ['github_contributor', 'github_user', 'github_repository']
+    # Scan workers share the commit filter of this process.
+    if config['aggregator'].getboolean('known_commit_filter'):
+        preload_known_commits()
+
+    workers = start_job_workers(
+        ['github_contributor', 'github_user'], user_threads, run_task_types=run_task_types)
+    workers += start_job_workers(
+        ['github_repository'], commit_threads, write_queue, run_task_types)
+    for worker in workers:
+        worker.join()
+
+    if writer_process is not None:
+        write_queue.put(None)
+        writer_process.join()
+
+
+def get_queue_status(session):
+    """Get the amount of jobs per task type and state."""
+    return session.query(Job.task_type, Job.state, func.count(Job.id)) \
+        .group_by(Job.task_type, Job.state) \
+        .order_by(Job.task_type, Job.state) \
+        .all()
+
+
+def clean_queue(session, failed=False):
+    """Remove all finished jobs from the queue. Failed jobs are only removed if `failed` is set."""
+    states = ['done', 'failed'] if failed else ['done']
+    removed = session.query(Job) \
+        .filter(Job.state.in_(states)) \
+        .delete(synchronize_session=False)
+    session.commit()
+
+    return removed
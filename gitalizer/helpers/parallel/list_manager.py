@@ -3,8 +3,14 @@ import multiprocessing
 
 from gitalizer.extensions import logger
 from gitalizer.helpers.config import config
+from gitalizer.helpers.parallel import new_session
 from gitalizer.helpers.parallel.task import Task
 from gitalizer.helpers.parallel.worker import Worker
+from gitalizer.helpers.parallel.job_queue import (
+    durable_queue_enabled,
+    enqueue,
+    start_job_workers,
+)
 
 
 class ListManager():
@@ -17,14 +23,22 @@ class ListManager():
         self.task_type = task_type
         self.sub_manager = sub_manager
         self.started = False
+        self.durable = durable_queue_enabled()
+        self.job_workers = []
 
         self.task_queue = multiprocessing.JoinableQueue()
         self.result_queue = multiprocessing.Queue()
         self.results = []
-        self.consumer_count = config['aggregator']['git_commit_scan_threads']
+        self.consumer_count = int(config['aggregator']['git_commit_scan_threads'])
 
     def start(self):
         """Initialize workers and add initial tasks."""
+        if self.durable:
+            self.enqueue(self.tasks)
+            self.job_workers = start_job_workers([self.task_type], self.consumer_count)
+            self.started = True
+            return
+
         # Create and start normal consumer
         consumers = [Worker(self.task_queue, self.result_queue)
                      for i in range(self.consumer_count)]
@@ -38,14 +52,33 @@ class ListManager():
     def add_tasks(self, tasks: list):
         """Add some tasks to the queue."""
         # Add unique tasks to queue
-        if self.started:
+        if self.started and self.durable:
+            self.enqueue(tasks)
+        elif self.started:
             for task in tasks:
                 self.task_queue.put(Task(self.task_type, task))
 
         self.tasks += tasks
 
+    def enqueue(self, tasks: list):
+        """Add tasks to the durable queue."""
+        sub_task_type = self.sub_manager.task_type if self.sub_manager else None
+        session = new_session()
+        try:
+            enqueue(session, self.task_type, tasks, sub_task_type)
+        finally:
+            session.close()
+
     def run(self):
         """All tasks are added. Process worker responses and wait for worker to finish."""
+        if self.durable:
+            for worker in self.job_workers:
+                worker.join()
+            if self.sub_manager is not None:
+                self.sub_manager.start()
+                self.sub_manager.run()
+            return
+
         # Start the sub manager
         if self.sub_manager is not None:
             logger.info('Start sub manager.')
@@ -1,22 +1,63 @@
 """Module for multiprocessing management."""
+import heapq
+import queue
+import itertools
+import traceback
 import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 
-from gitalizer.extensions import logger
+from gitalizer.extensions import sentry, logger
 from gitalizer.helpers.config import config
+from gitalizer.helpers.parallel import new_session
 from gitalizer.helpers.parallel.task import Task
 from gitalizer.helpers.parallel.worker import Worker
+from gitalizer.helpers.parallel.writer import Writer
+from gitalizer.helpers.parallel.job_queue import (
+    durable_queue_enabled,
+    enqueue,
+    preload_known_commits,
+    start_job_workers,
+)
 
 
 class Manager():
-    """Class for managing various multiprocessing tasks."""
+    """Class for managing various multiprocessing tasks.
+
+    Managers can be chained with a `sub_manager`, which gets the tasks from the results of this manager.
+    All managers of a chain run at the same time. Sub tasks are queued as soon as they arrive.
+
+    With `durable_queue` enabled, all tasks are stored in the database and
+    processed by job workers, which queue the sub tasks themselves.
+
+    Tasks can have a priority, e.g. the repository size. With `largest_tasks_first` enabled,
+    only a few tasks are handed to the workers at once and the highest priorities go first.
+    Long tasks are then started early and don't delay the end of a run.
+
+    With `staged_pipeline` enabled, repositories are processed in stages. Metadata
+    and clones are fetched by thread pools in this process, while the worker processes
+    only scan. Clones are prefetched within `clone_prefetch_size`.
+    """
 
     def __init__(self, task_type: str, tasks: list,
-                 sub_manager: 'Manager'=None):
+                 sub_manager: 'Manager'=None, priorities: dict=None):
         """Create a new manager."""
         self.tasks = set(tasks)
         self.task_type = task_type
         self.sub_manager = sub_manager
         self.started = False
+        self.finished_tasks = 0
+        self.priorities = dict(priorities or {})
+
+        # Heap of (-priority, insertion order, task) of all tasks, which haven't been handed out yet.
+        self.pending = []
+        self.counter = itertools.count()
+        self.dispatched_tasks = 0
+        self.all_tasks_added = False
+        self.poisoned = False
+        self.durable = durable_queue_enabled()
+        self.job_workers = []
+        # Task types of all managers in this chain.
+        self.run_task_types = None
 
         self.task_queue = multiprocessing.JoinableQueue()
         self.result_queue = multiprocessing.Queue()
@@ -26,57 +67,248 @@ class Manager():
         elif task_type == 'github_repository':
             self.consumer_count = int(config['aggregator']['git_commit_scan_threads'])
 
+        # Amount of tasks, which are handed to the workers ahead of time.
+        if config['aggregator'].getboolean('largest_tasks_first'):
+            self.dispatch_limit = 2 * self.consumer_count
+        else:
+            self.dispatch_limit = None
+
+        self.staged = task_type == 'github_repository' and not self.durable \
+            and config['aggregator'].getboolean('staged_pipeline')
+        # Task -> size in KB of all tasks, which are in one of the stages.
+        self.running = {}
+        if self.staged:
+            self.dispatch_limit = self.consumer_count + int(config['aggregator']['clone_prefetch'])
+            self.clone_budget = int(config['aggregator']['clone_prefetch_size']) * 1024
+
+        # Scan workers send their results to a single writer process.
+        self.write_queue = None
+        self.writer = None
+        if task_type == 'github_repository' and config['aggregator'].getboolean('writer_process'):
+            self.write_queue = multiprocessing.Queue(int(config['aggregator']['writer_queue_size']))
+
     def start(self):
-        """Initialize workers and add initial tasks."""
-        # Create and start normal consumer
-        consumers = [Worker(self.task_queue, self.result_queue)
-                     for i in range(self.consumer_count)]
-        for w in consumers:
-            w.start()
-
-        for task in self.tasks:
-            self.task_queue.put(Task(self.task_type, task))
+        """Initialize workers, add initial tasks and start all sub managers."""
+        # Scan workers share the commit filter of this process.
+        if self.task_type == 'github_repository' and config['aggregator'].getboolean('known_commit_filter'):
+            preload_known_commits()
+
+        if self.write_queue is not None:
+            self.writer = Writer(self.write_queue)
+            self.writer.start()
+
+        if self.run_task_types is None:
+            self.run_task_types = []
+            manager = self
+            while manager is not None:
+                self.run_task_types.append(manager.task_type)
+                manager = manager.sub_manager
+
+        if self.durable:
+            self.enqueue(self.tasks)
+            self.job_workers = start_job_workers(
+                [self.task_type], self.consumer_count, self.write_queue, self.run_task_types)
+        else:
+            # Create and start normal consumer
+            consumers = [Worker(self.task_queue, self.result_queue, self.write_queue)
+                         for i in range(self.consumer_count)]
+            for w in consumers:
+                w.start()
         self.started = True
 
-    def add_tasks(self, tasks: list):
+        # Start the sub manager, so it can work on sub tasks right away.
+        # All processes are forked before any stage threads are started.
+        if self.sub_manager is not None:
+            logger.info('Start sub manager.')
+            self.sub_manager.run_task_types = self.run_task_types
+            self.sub_manager.start()
+
+        if self.staged:
+            self.metadata_pool = ThreadPoolExecutor(int(config['aggregator']['metadata_threads']))
+            self.clone_pool = ThreadPoolExecutor(int(config['aggregator']['clone_threads']))
+
+        if not self.durable:
+            self.push_tasks(self.tasks)
+
+    def add_tasks(self, tasks: list, priorities: dict=None):
         """Add some tasks to the queue."""
         # Add unique tasks to queue
         tasks = set(tasks)
-        if self.started:
-            for task in (tasks - self.tasks):
-                self.task_queue.put(Task(self.task_type, task))
+        new_tasks = tasks - self.tasks
+        for task in new_tasks:
+            if priorities and task in priorities:
+                self.priorities[task] = priorities[task]
+
+        if self.started and self.durable:
+            self.enqueue(new_tasks)
+        elif self.started:
+            self.push_tasks(new_tasks)
 
         # Add new tasks to task set.
         self.tasks |= tasks
 
+    def push_tasks(self, tasks: set):
+        """Add tasks to the pending tasks and hand them to the workers."""
+        for task in tasks:
+            priority = self.priorities.get(task) or 0
+            heapq.heappush(self.pending, (-priority, next(self.counter), task))
+        self.dispatch()
+
+    def dispatch(self):
+        """Hand pending tasks to the workers, highest priority first.
+
+        Once all tasks are handed out, the workers get their poison pills.
+        """
+        while self.pending:
+            running = self.dispatched_tasks - self.finished_tasks
+            if self.dispatch_limit is not None and running >= self.dispatch_limit:
+                break
+
+            # Don't prefetch more clones than fit into the budget.
+            if self.staged and self.running:
+                size = -self.pending[0][0]
+                if sum(self.running.values()) + size > self.clone_budget:
+                    break
+
+            priority, _, task = heapq.heappop(self.pending)
+            if self.staged:
+                self.running[task] = -priority
+                self.metadata_pool.submit(self.fetch_metadata, task)
+            else:
+                self.task_queue.put(Task(self.task_type, task))
+            self.dispatched_tasks += 1
+
+        # Scan tasks of the staged pipeline are added by the clone threads.
+        # Their workers are stopped at the end of `run`.
+        if self.staged:
+            return
+
+        if self.all_tasks_added and not self.pending and not self.poisoned:
+            logger.info('Add poison pills.')
+            for _ in range(self.consumer_count+1):
+                self.task_queue.put(None)
+            self.poisoned = True
+
+    def fetch_metadata(self, task: str):
+        """Stage 1 of the staged pipeline. Runs in the metadata thread pool."""
+        response = self.run_stage('github_repository_metadata', task, task)
+        if 'metadata' in response:
+            # Github's full name differs from the task for renamed repositories.
+            response['metadata']['task'] = task
+            self.clone_pool.submit(self.clone, task, response['metadata'])
+        else:
+            self.result_queue.put(response)
+
+    def clone(self, task: str, metadata: dict):
+        """Stage 2 of the staged pipeline. Runs in the clone thread pool."""
+        response = self.run_stage('github_repository_clone', task, metadata)
+        if 'metadata' in response:
+            self.task_queue.put(Task('github_repository_scan', response['metadata']))
+        else:
+            self.result_queue.put(response)
+
+    def run_stage(self, task_type: str, task: str, stage_input):
+        """Run a stage of the staged pipeline and tag the response with the task."""
+        try:
+            response = Task(task_type, stage_input)()
+        except BaseException:
+            sentry.captureException()
+            response = {
+                'message': f'Error in {task_type} for {task}',
+                'error': traceback.format_exc(),
+            }
+        response['task'] = task
+
+        return response
+
+    def enqueue(self, tasks: set):
+        """Add tasks to the durable queue."""
+        sub_task_type = self.sub_manager.task_type if self.sub_manager else None
+        session = new_session()
+        try:
+            enqueue(session, self.task_type, tasks, sub_task_type, self.priorities)
+        finally:
+            session.close()
+
     def run(self):
         """All tasks are added. Process worker responses and wait for worker to finish."""
-        # Start the sub manager
-        if self.sub_manager is not None:
-            logger.info('Start sub manager.')
+        if self.durable:
+            self.run_durable()
+            return
 
         # Poison pill for user scanner
-        logger.info('Add poison pills.')
-        for _ in range(self.consumer_count+1):
-            self.task_queue.put(None)
+        self.all_tasks_added = True
+        self.dispatch()
 
         logger.info(f'Processing {len(self.tasks)} tasks')
-        finished_tasks = 0
-        while finished_tasks < len(self.tasks):
-            logger.info(f'Waiting: {finished_tasks} of {len(self.tasks)}')
-            result = self.result_queue.get()
-            self.results.append(result)
-
-            logger.info(result['message'])
-            if 'error' in result:
-                logger.info('Encountered an error:')
-                logger.info(result['error'])
-            elif self.sub_manager is not None:
-                self.sub_manager.add_tasks(result['tasks'])
-            finished_tasks += 1
+        while self.finished_tasks < len(self.tasks):
+            try:
+                result = self.result_queue.get(timeout=1)
+                logger.info(f'Waiting: {self.finished_tasks} of {len(self.tasks)}')
+                self.handle_result(result)
+            except queue.Empty:
+                pass
+
+            # Process the results of the already running sub managers.
+            if self.sub_manager is not None:
+                self.sub_manager.poll()
+
+        if self.staged:
+            logger.info('Add poison pills.')
+            for _ in range(self.consumer_count+1):
+                self.task_queue.put(None)
+            self.metadata_pool.shutdown()
+            self.clone_pool.shutdown()
+
+        # All results have been sent. Wait for the writer to write them.
+        if self.writer is not None:
+            logger.info('Waiting for writer.')
+            self.write_queue.put(None)
+            self.writer.join()
 
         # All sub tasks have been added.
         # Wait for them to finish.
         if self.sub_manager is not None:
-            self.sub_manager.start()
             self.sub_manager.run()
+
+    def run_durable(self):
+        """Wait for the job workers. They stop, once the whole queue is processed."""
+        logger.info(f'Processing {len(self.tasks)} queued tasks')
+        for worker in self.job_workers:
+            worker.join()
+
+        if self.writer is not None:
+            logger.info('Waiting for writer.')
+            self.write_queue.put(None)
+            self.writer.join()
+
+        if self.sub_manager is not None:
+            self.sub_manager.run()
+
+    def poll(self):
+        """Process all waiting worker responses without blocking."""
+        while True:
+            try:
+                result = self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.handle_result(result)
+
+        if self.sub_manager is not None:
+            self.sub_manager.poll()
+
+    def handle_result(self, result: dict):
+        """Log a worker response and pass its tasks to the sub manager."""
+        self.results.append(result)
+        self.running.pop(result.get('task'), None)
+
+        logger.info(result['message'])
+        if 'error' in result:
+            logger.info('Encountered an error:')
+            logger.info(result['error'])
+        elif self.sub_manager is not None:
+            self.sub_manager.add_tasks(result['tasks'], result.get('priorities'))
+        self.finished_tasks += 1
+
+        # A worker is free. Hand out the next task.
+        self.dispatch()
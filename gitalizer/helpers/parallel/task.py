@@ -17,6 +17,15 @@ class Task(object):
         elif self.task_type == 'github_repository':
             from gitalizer.aggregator.github.repository import get_github_repository
             return get_github_repository(self.task)
+        elif self.task_type == 'github_repository_metadata':
+            from gitalizer.aggregator.github.repository import get_repository_metadata
+            return get_repository_metadata(self.task)
+        elif self.task_type == 'github_repository_clone':
+            from gitalizer.aggregator.github.repository import clone_github_repository
+            return clone_github_repository(self.task)
+        elif self.task_type == 'github_repository_scan':
+            from gitalizer.aggregator.github.repository import scan_github_repository
+            return scan_github_repository(self.task)
         elif self.task_type == 'github_user':
             from gitalizer.aggregator.github.user import get_user_data
             return get_user_data(self.task)
@@ -1,21 +1,24 @@
 """Queue processing workers."""
-import time
 import multiprocessing
 
 from gitalizer.extensions import sentry
+from gitalizer.helpers.parallel import writer
 
 
 class Worker(multiprocessing.Process):
     """A worker which gets tasks from a queue."""
 
-    def __init__(self, task_queue, result_queue):
+    def __init__(self, task_queue, result_queue, write_queue=None):
         """Create a new worker."""
         multiprocessing.Process.__init__(self)
         self.task_queue = task_queue
         self.result_queue = result_queue
+        self.write_queue = write_queue
 
     def run(self):
         """Process incoming tasks."""
+        # Scan results are sent to the writer process, if there is one.
+        writer.write_queue = self.write_queue
         while True:
             try:
                 next_task = self.task_queue.get()
@@ -26,7 +29,6 @@ class Worker(multiprocessing.Process):
                 answer = next_task()
                 self.task_queue.task_done()
                 self.result_queue.put(answer)
-                time.sleep(1)
             except KeyboardInterrupt:
                 break
             except BaseException:
@@ -0,0 +1,144 @@
+"""A single process, which writes the results of all scan workers."""
+import queue
+import traceback
+import multiprocessing
+from sqlalchemy import bindparam
+
+from gitalizer.extensions import sentry, logger
+from gitalizer.helpers.config import config
+from gitalizer.helpers.parallel import new_session
+from gitalizer.helpers.db.lookup import match_any
+from gitalizer.helpers.db.bulk import insert_ignore, insert_commits, link_commits
+from gitalizer.models import Email, Contributor, Repository
+
+
+# The queue of the writer process. Set in each worker, if the writer is enabled.
+write_queue = None
+
+
+def new_batch(clone_url: str):
+    """Create an empty batch of scan results for a repository."""
+    return {
+        'clone_url': clone_url,
+        # New email addresses.
+        'emails': [],
+        # Address -> login of newly resolved emails.
+        'email_logins': {},
+        # Addresses without a Github user.
+        'unknown_emails': [],
+        # Logins of contributors, which should be added to the repository.
+        'repository_contributors': [],
+        # `CommitRecord`s of new commits.
+        'commits': [],
+        # Shas of all commits, which should be added to the repository.
+        'repository_commits': [],
+        # Column values, which should be updated on the repository.
+        'repository': {},
+    }
+
+
+def write_batch(session, batch: dict):
+    """Write a batch of scan results without committing.
+
+    All rows are written with bulk statements, which skip rows that
+    have been added by other workers in the meantime.
+    """
+    clone_url = batch['clone_url']
+    insert_ignore(session, Email.__table__, [{'email': address} for address in batch['emails']])
+
+    if batch['email_logins']:
+        logins = set(batch['email_logins'].values())
+        insert_ignore(session, Contributor.__table__, [{'login': login} for login in logins])
+
+        statement = Email.__table__.update() \
+            .where(Email.email == bindparam('address')) \
+            .values(contributor_login=bindparam('login'), unknown=False)
+        session.execute(statement, [
+            {'address': address, 'login': login}
+            for address, login in batch['email_logins'].items()
+        ])
+
+    if batch['unknown_emails']:
+        session.query(Email) \
+            .filter(match_any(Email.email, batch['unknown_emails'])) \
+            .update({'unknown': True}, synchronize_session=False)
+
+    Contributor.add_to_repository(batch['repository_contributors'], clone_url, session)
+    insert_commits(session, batch['commits'])
+    link_commits(session, batch['repository_commits'], clone_url)
+
+    if batch['repository']:
+        session.query(Repository) \
+            .filter(Repository.clone_url == clone_url) \
+            .update(batch['repository'], synchronize_session=False)
+
+
+def strip_scan_state(batch: dict):
+    """Don't mark the repository of a batch as completely scanned."""
+    batch['repository'].pop('completely_scanned', None)
+    batch['repository'].pop('scanned_refs', None)
+
+
+class Writer(multiprocessing.Process):
+    """A process, which writes batches from a queue.
+
+    Several batches are merged into a single transaction.
+    Batches of a failed transaction are retried one by one.
+
+    If a batch can't be written at all, its repository must not be marked as completely scanned.
+    Otherwise the next incremental scan would skip the lost commits.
+    """
+
+    def __init__(self, batch_queue):
+        """Create a new writer."""
+        multiprocessing.Process.__init__(self)
+        self.batch_queue = batch_queue
+        self.transaction_size = int(config['aggregator']['writer_transaction_batches'])
+        # Clone urls of repositories with lost batches.
+        self.failed = set()
+
+    def run(self):
+        """Write incoming batches until the poison pill is received."""
+        session = new_session()
+        running = True
+        while running:
+            try:
+                batches = [self.batch_queue.get()]
+                # Take everything that is waiting, up to the transaction size.
+                while len(batches) < self.transaction_size:
+                    try:
+                        batches.append(self.batch_queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                # Poison pill received: Write the rest and shut down.
+                if None in batches:
+                    running = False
+                    batches = [batch for batch in batches if batch is not None]
+
+                self.write(session, batches)
+            except KeyboardInterrupt:
+                break
+            except BaseException:
+                sentry.captureException()
+
+        session.close()
+
+    def write(self, session, batches: list):
+        """Write batches in a single transaction."""
+        try:
+            for batch in batches:
+                if batch['clone_url'] in self.failed:
+                    strip_scan_state(batch)
+                write_batch(session, batch)
+            session.commit()
+        except BaseException:
+            session.rollback()
+            if len(batches) == 1:
+                self.failed.add(batches[0]['clone_url'])
+                sentry.captureException(extra={'clone_url': batches[0]['clone_url']})
+                logger.error(traceback.format_exc())
+                return
+
+            for batch in batches:
+                self.write(session, [batch])
@@ -5,3 +5,4 @@ from .repository import Repository  # noqa
 from .contributor import Contributor, contributor_repository  # noqa
 from .time import TimezoneInterval # noqa
 from .analysis_result import AnalysisResult # noqa
+from .job import Job # noqa
@@ -7,6 +7,7 @@ from sqlalchemy.orm import joinedload
 
 from gitalizer.helpers.config import config
 from gitalizer.extensions import db, logger
+from gitalizer.helpers.db.bulk import insert_ignore
 
 
 contributor_repository = db.Table(
@@ -107,6 +108,25 @@ class Contributor(db.Model):
 
         raise exception
 
+    @staticmethod
+    def add_to_repository(logins: list, clone_url: str, session):
+        """Add contributors to a repository.
+
+        The association rows are inserted directly, without loading any relationship collections.
+        """
+        rows = [{'contributor_login': login, 'repository_clone_url': clone_url} for login in logins]
+        insert_ignore(session, contributor_repository, rows)
+
+    @staticmethod
+    def add_to_organizations(login: str, organization_logins: list, session):
+        """Add a contributor to organizations.
+
+        The association rows are inserted directly, without loading any relationship collections.
+        """
+        rows = [{'contributor_login': login, 'organization_login': organization_login}
+                for organization_login in organization_logins]
+        insert_ignore(session, contributor_organizations, rows)
+
     def should_scan(self):
         """Check if the user has been scanned in the last day.
 
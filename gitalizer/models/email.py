@@ -1,7 +1,6 @@
 """Representation of a git author email."""
 
 from sqlalchemy import ForeignKey
-from sqlalchemy.exc import IntegrityError
 
 from gitalizer.extensions import db
 
@@ -34,30 +33,3 @@ class Email(db.Model):
         """Constructor."""
         self.email = email
         self.contributor = contributor
-
-    @staticmethod
-    def get_email(email_address: str, session, do_commit=True):
-        """Create new email.
-
-        Try multiple times, as we can get Multiple additions through threading.
-        """
-        _try = 0
-        tries = 3
-        exception = None
-        while _try <= tries:
-            try:
-                email = session.query(Email).get(email_address)
-                if not email:
-                    email = Email(email_address)
-                    session.add(email)
-                    if do_commit:
-                        session.commit()
-                return email
-            except IntegrityError as e:
-                print(f'Got an Email IntegrityError, Try {_try} of {tries}')
-                session.rollback()
-                _try += 1
-                exception = e
-                pass
-
-        raise exception
@@ -0,0 +1,40 @@
+"""Representation of a queued task."""
+
+from sqlalchemy import func
+
+from gitalizer.extensions import db
+
+
+class Job(db.Model):
+    """A task of the durable task queue.
+
+    Jobs are claimed by setting them to `running` with a lease.
+    Workers renew the lease, while they process the job.
+    Jobs with an expired lease are considered abandoned and can be claimed again.
+    """
+
+    __tablename__ = 'job'
+    __table_args__ = (
+        db.UniqueConstraint('task_type', 'task'),
+        db.Index('ix_job_claim', 'state', 'task_type', 'priority'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_type = db.Column(db.String(40), nullable=False)
+    task = db.Column(db.String(240), nullable=False)
+    # Task type of the tasks in the result of this job.
+    sub_task_type = db.Column(db.String(40))
+
+    # One of `queued`, `running`, `done` or `failed`.
+    state = db.Column(db.String(20), default='queued', server_default='queued', nullable=False)
+    priority = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    attempts = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    lease_expires_at = db.Column(db.DateTime(timezone=True))
+    message = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        """Format a `Job` object."""
+        return f'<Job {self.task_type} {self.task} {self.state}>'
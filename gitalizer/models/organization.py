@@ -1,7 +1,7 @@
 """Module containing the `Organization` model."""
-from sqlalchemy.exc import IntegrityError
-
 from gitalizer.extensions import db
+from gitalizer.helpers.db.bulk import insert_ignore
+from gitalizer.helpers.db.lookup import bulk_lookup
 from gitalizer.models.contributor import contributor_organizations
 
 
@@ -24,26 +24,16 @@ class Organization(db.Model):
         self.url = url
 
     @staticmethod
-    def get_organization(login: str, url: str, session):
-        """Create new organization or add repository to it's list.
+    def get_organizations(organizations: list, session):
+        """Get or create many organizations at once.
 
-        Try multiple times, as we can get Multiple additions through threading.
+        `organizations` is a list of dicts with `login` and `url`.
+        All new organizations are inserted with a single statement, which skips
+        organizations that have been added by other workers in the meantime.
+        Returns a dict of all organizations by login.
         """
-        _try = 0
-        tries = 3
-        exception = None
-        while _try <= tries:
-            try:
-                organization = session.query(Organization).get(login)
-                if not organization:
-                    organization = Organization(login, url)
-                session.add(organization)
-                session.commit()
-                return organization
-            except IntegrityError as e:
-                print(f'Got an Organization IntegrityError, Try {_try} of {tries}')
-                _try += 1
-                exception = e
-                pass
-
-        raise exception
+        insert_ignore(session, Organization.__table__, organizations)
+        logins = [organization['login'] for organization in organizations]
+        organizations = bulk_lookup(session.query(Organization), Organization.login, logins)
+
+        return {organization.login: organization for organization in organizations}
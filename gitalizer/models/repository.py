@@ -2,6 +2,7 @@
 
 from datetime import datetime, timedelta
 from sqlalchemy import ForeignKey, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import backref
 from sqlalchemy.orm.collections import attribute_mapped_collection
 
@@ -9,6 +10,9 @@ from gitalizer.helpers.config import config
 from gitalizer.extensions import db
 from gitalizer.models.commit import commit_repository
 from gitalizer.models.contributor import contributor_repository
+from gitalizer.helpers.db.sha_set import ShaSet
+from gitalizer.helpers.db.bulk import insert_ignore
+from gitalizer.helpers.db.lookup import bulk_lookup
 
 
 class Repository(db.Model):
@@ -36,6 +40,12 @@ class Repository(db.Model):
     completely_scanned = db.Column(db.Boolean(), default=False,
                                    server_default='FALSE', nullable=False)
     updated_at = db.Column(db.DateTime, server_default=func.now(), nullable=False)
+    # Ref names and their tip shas of the last complete scan.
+    scanned_refs = db.Column(JSONB)
+    # Github's `pushed_at` at the time of the last complete scan.
+    pushed_at = db.Column(db.DateTime)
+    # Size in KB as reported by Github. Used to schedule big repositories first.
+    size = db.Column(db.Integer)
 
     children = db.relationship(
         "Repository",
@@ -77,16 +87,49 @@ class Repository(db.Model):
 
         return repo
 
-    def should_scan(self):
+    @staticmethod
+    def get_or_create_all(session, repositories: list):
+        """Get or create many repositories at once.
+
+        `repositories` is a list of dicts with `clone_url`, `name`, `full_name` and `size`.
+        All new repositories are inserted with a single statement, which skips
+        repositories that have been added by other workers in the meantime.
+        Returns a dict of all repositories by clone url.
+        """
+        insert_ignore(session, Repository.__table__, repositories)
+        clone_urls = [repository['clone_url'] for repository in repositories]
+        repositories = bulk_lookup(session.query(Repository), Repository.clone_url, clone_urls)
+
+        return {repository.clone_url: repository for repository in repositories}
+
+    def get_commit_shas(self, session):
+        """Get a `ShaSet` of all commits of this repository.
+
+        Only the shas are selected, no `Commit` objects are created.
+        """
+        query = session.query(commit_repository.c.commit_sha) \
+            .filter(commit_repository.c.repository_clone_url == self.clone_url) \
+            .order_by(commit_repository.c.commit_sha.collate('C'))
+
+        return ShaSet.from_query(query)
+
+    def should_scan(self, pushed_at: datetime = None):
         """Check if the repo has been updated in the last day.
 
         If that is the case, we want to skip it.
+        `pushed_at` is Github's current `pushed_at` of this repository, if known.
+        Repositories without pushes since the last complete scan are skipped as well.
         """
         rescan_interval = int(config['aggregator']['repository_rescan_interval'])
         rescan_threshold = datetime.utcnow() - timedelta(seconds=rescan_interval)
         up_to_date = self.completely_scanned and self.updated_at >= rescan_threshold
 
-        if self.fork or self.broken or self.too_big or up_to_date:
+        unchanged = self.completely_scanned \
+            and pushed_at is not None \
+            and self.pushed_at is not None \
+            and pushed_at <= self.pushed_at
+
+        if self.fork or self.broken or self.too_big or up_to_date or unchanged:
             return False
 
         return True
@@ -18,8 +18,8 @@ setup(
         'psycopg2-binary',
 
         # Aggregator
-        'pygithub~=1.43',
-        'pygit2~=0.27',
+        'pygithub==1.46',
+        'pygit2~=0.28',
         'pytz~=2018.5',
 
         # Logging
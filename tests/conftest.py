@@ -0,0 +1,83 @@
+"""Test configuration.
+
+Importing gitalizer reads `~/.config/gitalizer.ini`. The tests use
+a temporary home with a configuration based on `gitalizer.example.ini`.
+"""
+import os
+import tempfile
+import configparser
+
+import pytest
+from pygit2 import Signature, GIT_FILEMODE_BLOB, init_repository
+
+
+def pytest_configure(config):
+    """Create the configuration before any gitalizer module is imported."""
+    home = tempfile.mkdtemp(prefix='gitalizer_test_')
+    os.environ['HOME'] = home
+
+    example = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gitalizer.example.ini')
+    gitalizer_config = configparser.ConfigParser()
+    gitalizer_config.read(example)
+    gitalizer_config['develop']['log_dir'] = os.path.join(home, 'logs')
+    gitalizer_config['cloning']['temporary_clone_path'] = os.path.join(home, 'clones')
+    gitalizer_config['cloning']['clone_cache_path'] = os.path.join(home, 'cache')
+
+    os.makedirs(os.path.join(home, '.config'))
+    with open(os.path.join(home, '.config', 'gitalizer.ini'), 'w') as fd:
+        gitalizer_config.write(fd)
+
+
+class FakeClock():
+    """Replacement of the `time` module, whose `sleep` advances the time instantly."""
+
+    def __init__(self):
+        """Start at a fixed time."""
+        self.now = 1000000.0
+        self.sleeps = []
+
+    def time(self):
+        """Get the current time."""
+        return self.now
+
+    def sleep(self, seconds):
+        """Advance the time."""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    """Get a fake clock. Use `monkeypatch` to put it in place of a module's `time`."""
+    return FakeClock()
+
+
+def headers(remaining, reset, limit=5000):
+    """Get the rate limit headers of a response."""
+    return {
+        'x-ratelimit-remaining': str(remaining),
+        'x-ratelimit-limit': str(limit),
+        'x-ratelimit-reset': str(reset),
+    }
+
+
+def commit_file(repo, content: str, branch: str = None):
+    """Commit a single file to a branch of a bare repository. Defaults to the branch of `HEAD`."""
+    if branch is None:
+        branch = repo.lookup_reference('HEAD').target
+    parents = []
+    if branch in repo.listall_references():
+        parents = [repo.lookup_reference(branch).target]
+
+    builder = repo.TreeBuilder()
+    builder.insert('file', repo.create_blob(content.encode('utf-8')), GIT_FILEMODE_BLOB)
+    signature = Signature('Tester', 'tester@example.com', 1500000000, 0)
+    return repo.create_commit(branch, signature, signature, content, builder.write(), parents)
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """Get a bare repository with a single commit, which serves as a local remote."""
+    repo = init_repository(str(tmp_path / 'origin.git'), bare=True)
+    commit_file(repo, 'initial')
+    return repo
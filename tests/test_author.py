@@ -0,0 +1,145 @@
+"""Tests for the resolution of email addresses to Github logins."""
+from types import SimpleNamespace
+
+from gitalizer.aggregator.github.author import AuthorResolver
+
+
+def user(login):
+    """Create a Github user of a commit response."""
+    return SimpleNamespace(login=login, _url=SimpleNamespace(value=f'/users/{login}'))
+
+
+def commit(sha, author_email, author=None, committer_email=None, committer=None):
+    """Create a Github commit response."""
+    return SimpleNamespace(
+        sha=sha,
+        commit=SimpleNamespace(
+            author=SimpleNamespace(email=author_email),
+            committer=SimpleNamespace(email=committer_email or author_email),
+        ),
+        author=author,
+        committer=committer or author,
+    )
+
+
+class FakeRepository():
+    """A Github repository with a paged commit listing, which records all API calls."""
+
+    def __init__(self, pages, commits=None):
+        """Create a repository from a list of pages."""
+        self.pages = pages
+        self.commits = commits or {}
+        self.calls = []
+
+    def get_commits(self):
+        """Get the commit listing."""
+        return FakeListing(self)
+
+    def get_commit(self, sha):
+        """Get a single commit."""
+        self.calls.append(('get_commit', sha))
+        return self.commits[sha]
+
+
+class FakeListing():
+    """A commit listing, which is requested page by page."""
+
+    def __init__(self, repository):
+        """Create a listing of a repository."""
+        self.repository = repository
+
+    def get_page(self, page):
+        """Get a page. Pages after the last one are empty."""
+        self.repository.calls.append(('get_page', page))
+        if page < len(self.repository.pages):
+            return self.repository.pages[page]
+        return []
+
+
+def test_resolve_from_listing():
+    """Addresses on the first page are resolved with a single API call."""
+    repository = FakeRepository([
+        [commit('a1', 'alice@example.com', user('alice')), commit('b1', 'bob@example.com', user('bob'))],
+        [commit('c1', 'carol@example.com', user('carol'))],
+    ])
+    resolver = AuthorResolver(repository)
+    resolver.resolve({'alice@example.com', 'bob@example.com'})
+
+    assert repository.calls == [('get_page', 0)]
+    assert resolver.get_login('alice@example.com', 'a1') == 'alice'
+    assert resolver.get_login('bob@example.com', 'b1') == 'bob'
+    assert repository.calls == [('get_page', 0)]
+    assert resolver.api_calls == 1
+    assert resolver.resolved == 2
+
+
+def test_resolve_pages_until_resolved():
+    """Paging continues on the next page, while enough addresses are missing."""
+    repository = FakeRepository([
+        [commit('a1', 'alice@example.com', user('alice'))],
+        [commit('b1', 'bob@example.com', user('bob'))],
+        [commit('c1', 'carol@example.com', user('carol'))],
+    ])
+    resolver = AuthorResolver(repository)
+    resolver.resolve({'alice@example.com', 'bob@example.com', 'carol@example.com'})
+
+    assert repository.calls == [('get_page', 0), ('get_page', 1)]
+    assert resolver.logins == {'alice@example.com': 'alice', 'bob@example.com': 'bob'}
+
+    # Paging continues where it stopped.
+    resolver.resolve({'carol@example.com'})
+    assert repository.calls[-1] == ('get_page', 2)
+    assert resolver.logins['carol@example.com'] == 'carol'
+
+
+def test_exhausted_listing():
+    """An empty page stops all further paging."""
+    repository = FakeRepository([[commit('a1', 'alice@example.com', user('alice'))]])
+    resolver = AuthorResolver(repository)
+    resolver.resolve({'dave@example.com', 'erin@example.com', 'frank@example.com'})
+
+    assert repository.calls == [('get_page', 0), ('get_page', 1)]
+    assert resolver.listing_exhausted
+
+    resolver.resolve({'dave@example.com'})
+    assert repository.calls == [('get_page', 0), ('get_page', 1)]
+
+
+def test_fallback_to_single_commit():
+    """Addresses, which aren't in the listing, are resolved by a lookup of their commit."""
+    repository = FakeRepository(
+        [[commit('a1', 'alice@example.com', user('alice'))]],
+        {'d1': commit('d1', 'dave@example.com', user('dave'))},
+    )
+    resolver = AuthorResolver(repository)
+    resolver.resolve({'alice@example.com'})
+
+    assert resolver.get_login('dave@example.com', 'd1') == 'dave'
+    assert repository.calls[-1] == ('get_commit', 'd1')
+
+    # The lookup is memoized.
+    assert resolver.get_login('dave@example.com', 'd1') == 'dave'
+    assert repository.calls.count(('get_commit', 'd1')) == 1
+
+
+def test_address_without_user():
+    """Addresses, which Github knows without a user, aren't looked up again."""
+    repository = FakeRepository([[commit('a1', 'ghost@example.com', None)]])
+    resolver = AuthorResolver(repository)
+    resolver.resolve({'ghost@example.com'})
+
+    assert resolver.logins == {'ghost@example.com': None}
+    assert resolver.get_login('ghost@example.com', 'a1') is None
+    assert ('get_commit', 'a1') not in repository.calls
+
+
+def test_login_of_user_wins():
+    """A known login isn't overwritten by a commit without a user."""
+    repository = FakeRepository([[
+        commit('a1', 'alice@example.com', user('alice')),
+        commit('a2', 'alice@example.com', None),
+    ]])
+    resolver = AuthorResolver(repository)
+    resolver.resolve({'alice@example.com'})
+
+    assert resolver.logins['alice@example.com'] == 'alice'
@@ -0,0 +1,91 @@
+"""Tests for the shared rate limit budget."""
+import pytest
+
+from gitalizer.helpers.github import budget as budget_module
+from gitalizer.helpers.github.budget import RateBudget
+from tests.conftest import headers
+
+
+@pytest.fixture
+def budget(clock, monkeypatch):
+    """Get a budget with a reserve of 10, which uses the fake clock."""
+    monkeypatch.setattr(budget_module, 'time', clock)
+    return RateBudget(10)
+
+
+def test_unknown_budget(budget, clock):
+    """Requests aren't blocked before the first response."""
+    for _ in range(100):
+        budget.acquire()
+
+    assert clock.sleeps == []
+    assert budget.available() is None
+    assert budget.status() == (-1, -1, None)
+
+
+def test_acquire_counts_down(budget, clock):
+    """Every request takes one unit from the budget."""
+    budget.update(headers(15, clock.now + 100))
+    assert budget.available() == 5
+
+    for _ in range(5):
+        assert budget.try_acquire()
+    assert not budget.try_acquire()
+    assert budget.available() == 0
+
+
+def test_block_until_reset(budget, clock):
+    """Once only the reserve is left, requests block until the reset."""
+    budget.update(headers(10, clock.now + 100))
+    budget.acquire()
+
+    assert clock.sleeps == [101]
+    # The budget is unknown again after the reset.
+    assert budget.available() is None
+
+
+def test_release(budget, clock):
+    """Requests, which didn't count, are given back."""
+    budget.update(headers(12, clock.now + 100))
+    budget.acquire()
+    budget.release()
+
+    assert budget.available() == 2
+
+
+def test_out_of_order_responses(budget, clock):
+    """The lowest count of a rate limit window is the latest one."""
+    reset = clock.now + 100
+    budget.update(headers(100, reset))
+    budget.update(headers(90, reset))
+    budget.update(headers(95, reset))
+    assert budget.status()[0] == 90
+
+    # A new window replaces the old one.
+    budget.update(headers(4999, reset + 3600))
+    assert budget.status()[0] == 4999
+
+
+def test_ignore_responses_without_headers(budget):
+    """Responses without rate limit headers don't change the budget."""
+    budget.update({})
+
+    assert budget.available() is None
+
+
+def test_shared_between_processes():
+    """Requests of forked processes are taken from the same budget."""
+    import multiprocessing
+
+    budget = RateBudget(10)
+    budget.update(headers(20, 2 ** 31))
+
+    def take_requests():
+        for _ in range(5):
+            budget.acquire()
+
+    process = multiprocessing.get_context('fork').Process(target=take_requests)
+    process.start()
+    process.join()
+
+    assert budget.available() == 5
@@ -0,0 +1,113 @@
+"""Tests for the persistent cache of bare clones."""
+import os
+
+import pytest
+
+from gitalizer.helpers.config import config
+from gitalizer.aggregator.git.cache import (
+    get_cache_dir,
+    get_cached_repository,
+    release_cached_repository,
+    mark_in_use,
+    prune_cache,
+)
+from tests.conftest import commit_file
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    """Use an empty clone cache."""
+    path = str(tmp_path / 'cache')
+    monkeypatch.setitem(config['cloning'], 'clone_cache_path', path)
+    return path
+
+
+def url_of(repo):
+    """Get the file url of a local repository."""
+    return 'file://' + os.path.abspath(repo.path)
+
+
+def fake_clone(cache_path: str, name: str, size: int, mtime: int):
+    """Create a cache entry of `size` MB, which was last used at `mtime`."""
+    path = os.path.abspath(os.path.join(cache_path, name))
+    os.makedirs(path)
+    with open(path + '.size', 'w') as fd:
+        fd.write(str(size * 1024 * 1024))
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_first_clone(origin, cache_path):
+    """Unknown repositories are cloned into the cache and marked as in use."""
+    url = url_of(origin)
+    repo = get_cached_repository(url)
+    clone_dir = get_cache_dir(url)
+
+    assert repo.is_bare
+    assert repo.head.target == origin.head.target
+    assert os.path.dirname(clone_dir) == os.path.abspath(cache_path)
+    assert int(open(clone_dir + '.size').read()) > 0
+    assert os.path.exists(clone_dir + '.in_use')
+
+    release_cached_repository(url)
+    assert not os.path.exists(clone_dir + '.in_use')
+
+
+def test_incremental_fetch(origin, cache_path):
+    """Cached clones are updated by fetching new commits and branches."""
+    url = url_of(origin)
+    get_cached_repository(url)
+    release_cached_repository(url)
+    inode = os.stat(get_cache_dir(url)).st_ino
+
+    new_commit = commit_file(origin, 'second')
+    branch_commit = commit_file(origin, 'branch', 'refs/heads/feature')
+    repo = get_cached_repository(url)
+
+    # The clone is updated in place.
+    assert os.stat(get_cache_dir(url)).st_ino == inode
+    assert repo.head.target == new_commit
+    assert repo.lookup_reference('refs/heads/feature').target == branch_commit
+
+
+def test_broken_clone(origin, cache_path):
+    """Broken clones are thrown away and cloned again."""
+    url = url_of(origin)
+    clone_dir = get_cache_dir(url)
+    os.makedirs(clone_dir)
+    with open(os.path.join(clone_dir, 'HEAD'), 'w') as fd:
+        fd.write('garbage')
+
+    repo = get_cached_repository(url)
+
+    assert repo.head.target == origin.head.target
+
+
+def test_prune_least_recently_used(cache_path):
+    """The least recently used clones are removed, until the cache fits into its budget."""
+    oldest = fake_clone(cache_path, 'oldest', 1, 1000)
+    newest = fake_clone(cache_path, 'newest', 1, 3000)
+    middle = fake_clone(cache_path, 'middle', 1, 2000)
+
+    assert prune_cache(max_size=2) == 1
+    assert not os.path.exists(oldest)
+    assert not os.path.exists(oldest + '.size')
+    assert os.path.exists(middle)
+    assert os.path.exists(newest)
+
+    assert prune_cache(max_size=1) == 1
+    assert not os.path.exists(middle)
+    assert os.path.exists(newest)
+
+
+def test_prune_skips_clones_in_use(cache_path):
+    """Clones, which are used by a scan, are never removed."""
+    oldest = fake_clone(cache_path, 'oldest', 1, 1000)
+    middle = fake_clone(cache_path, 'middle', 1, 2000)
+    newest = fake_clone(cache_path, 'newest', 1, 3000)
+    mark_in_use(oldest)
+
+    assert prune_cache(max_size=2) == 1
+    assert os.path.exists(oldest)
+    assert not os.path.exists(middle)
+    assert os.path.exists(newest)
@@ -0,0 +1,65 @@
+"""Tests for the durable task queue."""
+import time
+
+from gitalizer.helpers.parallel import job_queue
+from gitalizer.helpers.parallel.job_queue import LeaseHeartbeat
+
+
+class FakeSession():
+    """Session replacement, which doesn't need a database."""
+
+    def __init__(self):
+        """Create a session."""
+        self.closed = False
+
+    def rollback(self):
+        """Roll back the session."""
+
+    def close(self):
+        """Close the session."""
+        self.closed = True
+
+
+def test_lease_heartbeat(monkeypatch):
+    """The lease is renewed until the heartbeat is stopped."""
+    session = FakeSession()
+    renewals = []
+
+    def renew_lease(renew_session, job_id, attempts):
+        assert renew_session is session
+        renewals.append((job_id, attempts))
+        return True
+
+    monkeypatch.setattr(job_queue, 'new_session', lambda: session)
+    monkeypatch.setattr(job_queue, 'renew_lease', renew_lease)
+
+    heartbeat = LeaseHeartbeat(7, 2, interval=0.01)
+    heartbeat.start()
+    time.sleep(0.2)
+    heartbeat.stop()
+    count = len(renewals)
+    time.sleep(0.05)
+
+    assert count > 0
+    assert set(renewals) == {(7, 2)}
+    assert len(renewals) == count
+    assert session.closed
+
+
+def test_lost_lease(monkeypatch):
+    """The heartbeat stops, once another worker claimed the job."""
+    renewals = []
+
+    def renew_lease(session, job_id, attempts):
+        renewals.append(job_id)
+        return False
+
+    monkeypatch.setattr(job_queue, 'new_session', FakeSession)
+    monkeypatch.setattr(job_queue, 'renew_lease', renew_lease)
+
+    heartbeat = LeaseHeartbeat(7, 2, interval=0.01)
+    heartbeat.start()
+    heartbeat.join(1)
+
+    assert not heartbeat.is_alive()
+    assert renewals == [7]
@@ -0,0 +1,117 @@
+"""Tests for the staged pipeline of the manager."""
+import queue
+
+import pytest
+
+from gitalizer.helpers.config import config
+from gitalizer.helpers.parallel import manager as manager_module
+from gitalizer.helpers.parallel.manager import Manager
+from gitalizer.aggregator.github import repository as repository_module
+
+
+class ImmediatePool():
+    """Thread pool replacement, which runs submitted functions right away."""
+
+    def submit(self, function, *args):
+        """Run a function."""
+        function(*args)
+
+
+class FakeTask():
+    """Stage task, whose repositories got renamed on Github."""
+
+    def __init__(self, task_type, task):
+        """Create a task."""
+        self.task_type = task_type
+        self.task = task
+
+    def __call__(self):
+        """Run the metadata or clone stage."""
+        if self.task_type == 'github_repository_metadata':
+            return {'message': '', 'metadata': {
+                'full_name': f'renamed/{self.task}',
+                'clone_url': f'git@github.com:renamed/{self.task}.git',
+                'owner': 'renamed',
+                'name': self.task,
+            }}
+
+        return {'message': '', 'metadata': self.task}
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """Get a manager of the staged pipeline without any worker processes."""
+    monkeypatch.setitem(config['aggregator'], 'staged_pipeline', 'yes')
+    monkeypatch.setitem(config['aggregator'], 'durable_queue', 'no')
+    monkeypatch.setitem(config['aggregator'], 'writer_process', 'no')
+    monkeypatch.setitem(config['aggregator'], 'git_commit_scan_threads', '1')
+    monkeypatch.setitem(config['aggregator'], 'clone_prefetch', '4')
+    monkeypatch.setitem(config['aggregator'], 'clone_prefetch_size', '1')
+    monkeypatch.setattr(manager_module, 'Task', FakeTask)
+
+    manager = Manager('github_repository', [])
+    manager.task_queue = queue.Queue()
+    manager.result_queue = queue.Queue()
+    manager.metadata_pool = ImmediatePool()
+    manager.clone_pool = ImmediatePool()
+    manager.started = True
+
+    return manager
+
+
+def scan(manager):
+    """Take the next scan task and answer like the scan stage."""
+    task = manager.task_queue.get_nowait()
+    metadata = task.task
+    response = {'message': '', 'task': metadata.get('task', metadata['full_name'])}
+    manager.handle_result(response)
+
+    return metadata
+
+
+def test_budget(manager):
+    """Clones are only prefetched within the budget. The biggest tasks go first."""
+    # Sizes in KB. The budget is 1 MB.
+    manager.add_tasks(['small', 'big', 'medium'], {'small': 100, 'big': 800, 'medium': 300})
+
+    assert manager.running == {'big': 800}
+    assert manager.task_queue.qsize() == 1
+
+    scan(manager)
+    assert manager.running == {'medium': 300, 'small': 100}
+
+    scan(manager)
+    scan(manager)
+    assert manager.running == {}
+    assert manager.finished_tasks == 3
+
+
+def test_renamed_repositories(manager):
+    """Finished scans free their budget, even if Github reports another full name."""
+    manager.add_tasks(['first', 'second'], {'first': 900, 'second': 900})
+
+    first = scan(manager)
+    assert first['full_name'] == f"renamed/{first['task']}"
+    assert len(manager.running) == 1
+
+    second = scan(manager)
+    assert {first['task'], second['task']} == {'first', 'second'}
+    assert manager.running == {}
+    assert manager.finished_tasks == 2
+
+
+def test_scan_stage_tags_task(monkeypatch):
+    """The scan stage answers with the task of the manager."""
+    def get_repo(*args, **kwargs):
+        raise repository_module.GitError('No clone')
+
+    monkeypatch.setattr(repository_module, 'call_github_function', get_repo)
+    response = repository_module.scan_github_repository({
+        'task': 'old/name',
+        'full_name': 'new/name',
+        'clone_url': 'git@github.com:new/name.git',
+        'owner': 'new',
+        'name': 'name',
+    })
+
+    assert response['task'] == 'old/name'
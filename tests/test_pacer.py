@@ -0,0 +1,89 @@
+"""Tests for the adaptive spacing of Github API requests."""
+import pytest
+
+from gitalizer.helpers.github import pacer as pacer_module
+from gitalizer.helpers.github.pacer import Pacer
+
+
+@pytest.fixture
+def pacer(clock, monkeypatch):
+    """Get a pacer, which uses the fake clock."""
+    monkeypatch.setattr(pacer_module, 'time', clock)
+    return Pacer(backoff=60, max_interval=30)
+
+
+def test_no_delay_without_pushback(pacer, clock):
+    """Requests aren't delayed, as long as Github doesn't push back."""
+    for _ in range(10):
+        pacer.wait()
+        pacer.observe(200, {}, '{}')
+
+    assert clock.sleeps == []
+
+
+def test_retry_after(pacer, clock):
+    """`Retry-After` pauses all requests and spaces the following ones."""
+    pacer.observe(403, {'retry-after': '20'}, '{}')
+    pacer.wait()
+
+    assert clock.sleeps == [20]
+    assert pacer.interval.value == 1.0
+
+    # The next request is spaced by the interval.
+    pacer.wait()
+    assert clock.sleeps == [20, 1.0]
+
+
+def test_abuse_detection(pacer, clock):
+    """Abuse detection responses pause for the backoff and double the interval."""
+    message = '{"message": "You have triggered an abuse detection mechanism."}'
+    pacer.observe(403, {}, message)
+    pacer.wait()
+    assert clock.sleeps == [60]
+    assert pacer.interval.value == 1.0
+
+    pacer.observe(403, {}, message)
+    assert pacer.interval.value == 2.0
+
+
+def test_interval_limit(pacer):
+    """The interval doesn't grow beyond `max_interval`."""
+    for _ in range(10):
+        pacer.observe(403, {'retry-after': '1'}, '{}')
+
+    assert pacer.interval.value == 30
+
+
+def test_interval_decay(pacer):
+    """Successful responses let the interval decay until it vanishes."""
+    pacer.observe(403, {'retry-after': '1'}, '{}')
+    pacer.observe(200, {}, '{}')
+    assert pacer.interval.value == pytest.approx(0.9)
+
+    for _ in range(100):
+        pacer.observe(200, {}, '{}')
+    assert pacer.interval.value == 0.0
+
+
+def test_exhausted_rate_limit(pacer, clock):
+    """An exhausted rate limit of one token doesn't pause the requests of other tokens."""
+    reset = int(clock.now) + 100
+    pacer.observe(200, {'x-ratelimit-remaining': '0', 'x-ratelimit-reset': str(reset)}, '{}')
+    pacer.wait()
+
+    assert clock.sleeps == []
+    # The interval isn't touched by the rate limit.
+    assert pacer.interval.value == 0.0
+
+
+def test_shared_between_processes():
+    """A pause of a forked process delays the requests of all processes."""
+    import time
+    import multiprocessing
+
+    pacer = Pacer(backoff=60, max_interval=30)
+    process = multiprocessing.get_context('fork').Process(target=pacer.pause, args=(100,))
+    process.start()
+    process.join()
+
+    assert pacer.next_request.value > time.time() + 50
@@ -0,0 +1,59 @@
+"""Tests for the comparison of remote refs with the tips of the last scan."""
+import os
+
+import pytest
+
+from gitalizer.helpers.config import config
+from gitalizer.aggregator.git.repository import get_remote_refs, remote_unchanged
+from tests.conftest import commit_file
+
+
+@pytest.fixture
+def url(origin, tmp_path, monkeypatch):
+    """Get the file url of the origin repository."""
+    monkeypatch.setitem(config['cloning'], 'temporary_clone_path', str(tmp_path))
+    return 'file://' + os.path.abspath(origin.path)
+
+
+def scan(origin):
+    """Get the refs, which a scan of the origin would remember."""
+    head = origin.lookup_reference('HEAD').target
+    return {head: origin.head.target.hex}
+
+
+def test_get_remote_refs(origin, url):
+    """All refs are listed and `HEAD` points to the default branch."""
+    branch_commit = commit_file(origin, 'branch', 'refs/heads/feature')
+    refs = get_remote_refs(url)
+
+    assert refs['HEAD'] == origin.head.target.hex
+    assert refs[origin.lookup_reference('HEAD').target] == origin.head.target.hex
+    assert refs['refs/heads/feature'] == branch_commit.hex
+
+
+def test_unchanged(origin, url):
+    """The remote is unchanged, if it still points to the scanned tips."""
+    assert remote_unchanged(url, scan(origin))
+
+
+def test_new_commit(origin, url):
+    """A new commit on the scanned branch changes the remote."""
+    scanned_refs = scan(origin)
+    commit_file(origin, 'second')
+
+    assert not remote_unchanged(url, scanned_refs)
+
+
+def test_changed_default_branch(origin, url):
+    """A new default branch changes the remote, even if the old branch is untouched."""
+    scanned_refs = scan(origin)
+    commit_file(origin, 'main', 'refs/heads/main')
+    origin.set_head('refs/heads/main')
+
+    assert not remote_unchanged(url, scanned_refs)
+
+
+@pytest.mark.parametrize('scanned_refs', [None, {}])
+def test_never_scanned(url, scanned_refs):
+    """Repositories without scanned refs always need a scan."""
+    assert not remote_unchanged(url, scanned_refs)
@@ -0,0 +1,188 @@
+"""Tests for the cache of Github API responses."""
+import sqlite3
+
+import pytest
+
+from gitalizer.helpers.github import response_cache as response_cache_module
+from gitalizer.helpers.github.response_cache import ResponseCache
+
+
+URL = 'https://api.github.com/users/nukesor'
+BODY = '{"login": "nukesor"}'
+
+
+@pytest.fixture
+def cache(tmp_path, clock, monkeypatch):
+    """Get an empty cache of 1 MB, which uses the fake clock."""
+    monkeypatch.setattr(response_cache_module, 'time', clock)
+    return ResponseCache(str(tmp_path / 'cache' / 'responses.sqlite'), 1, 1000)
+
+
+def request_headers(token='first'):
+    """Get the headers of a request."""
+    return {'Authorization': f'token {token}'}
+
+
+def store(cache, etag='"v1"', url=URL, body=BODY):
+    """Cache a response."""
+    headers = request_headers()
+    cached = cache.prepare(url, headers)
+    return cache.handle(url, headers, cached, 200, {'etag': etag, 'content-type': 'json'}, body)
+
+
+def is_cached(cache, url=URL):
+    """Check if there is a cached response for an url."""
+    return cache.prepare(url, request_headers()) is not None
+
+
+def test_miss(cache):
+    """Unknown requests are sent without conditional headers."""
+    headers = request_headers()
+
+    assert cache.prepare(URL, headers) is None
+    assert 'If-None-Match' not in headers
+
+    status, _, output = cache.handle(URL, headers, None, 200, {'etag': '"v1"'}, BODY)
+    assert (status, output) == (200, BODY)
+    assert (cache.hits.value, cache.misses.value) == (0, 1)
+
+
+def test_hit(cache):
+    """Cached responses are revalidated and served on `304 Not Modified`."""
+    store(cache)
+    headers = request_headers()
+    cached = cache.prepare(URL, headers)
+    assert headers['If-None-Match'] == '"v1"'
+
+    status, response_headers, output = cache.handle(
+        URL, headers, cached, 304, {'x-ratelimit-remaining': '4999'}, None)
+
+    assert (status, output) == (200, BODY)
+    # The cached headers are kept, the current rate limit headers win.
+    assert response_headers['content-type'] == 'json'
+    assert response_headers['x-ratelimit-remaining'] == '4999'
+    assert (cache.hits.value, cache.misses.value) == (1, 1)
+    assert cache.bytes_saved.value == len(BODY)
+
+
+def test_changed_response(cache):
+    """Changed responses replace the cached response."""
+    store(cache)
+    store(cache, etag='"v2"')
+    headers = request_headers()
+    cache.prepare(URL, headers)
+
+    assert headers['If-None-Match'] == '"v2"'
+
+
+def test_last_modified(cache):
+    """Responses without `ETag` are revalidated with `Last-Modified`."""
+    headers = request_headers()
+    last_modified = 'Thu, 01 Jan 2019 00:00:00 GMT'
+    cache.handle(URL, headers, None, 200, {'last-modified': last_modified}, BODY)
+
+    headers = request_headers()
+    cache.prepare(URL, headers)
+    assert headers['If-Modified-Since'] == last_modified
+    assert 'If-None-Match' not in headers
+
+
+def test_uncacheable_response(cache):
+    """Errors and responses without validators aren't cached."""
+    headers = request_headers()
+    cache.handle(URL, headers, None, 404, {'etag': '"v1"'}, BODY)
+    cache.handle(URL, headers, None, 200, {}, BODY)
+
+    assert cache.prepare(URL, request_headers()) is None
+
+
+def test_cached_per_token(cache):
+    """Responses are cached per token, as they depend on its permissions."""
+    store(cache)
+
+    assert cache.prepare(URL, request_headers('second')) is None
+
+
+def test_persistent(cache, tmp_path):
+    """The cache survives a restart, while tokens are only stored as a hash."""
+    store(cache)
+    cache = ResponseCache(str(tmp_path / 'cache' / 'responses.sqlite'), 1, 1000)
+
+    assert cache.prepare(URL, request_headers()) is not None
+    with open(cache.path, 'rb') as fd:
+        assert b'token first' not in fd.read()
+
+
+def test_stale_conditional_headers(cache):
+    """Conditional headers of an earlier request are removed, e.g. on redirects."""
+    headers = request_headers()
+    headers['If-None-Match'] = '"other"'
+
+    assert cache.prepare(URL, headers) is None
+    assert 'If-None-Match' not in headers
+
+
+def test_prune_old_responses(cache, clock):
+    """Responses, which haven't been used for `max_age` seconds, are removed."""
+    store(cache, url=URL + '/old')
+    clock.sleep(600)
+    store(cache)
+    clock.sleep(600)
+
+    assert cache.prune() == 1
+    assert not is_cached(cache, URL + '/old')
+    assert is_cached(cache)
+
+
+def test_hits_keep_responses(cache, clock):
+    """Revalidated responses count as used."""
+    store(cache)
+    clock.sleep(600)
+    headers = request_headers()
+    cache.handle(URL, headers, cache.prepare(URL, headers), 304, {}, None)
+    clock.sleep(600)
+
+    assert cache.prune() == 0
+    assert is_cached(cache)
+
+
+def test_prune_least_recently_used(cache, clock):
+    """The least recently used responses are removed, until the cache fits into its budget."""
+    body = 'x' * 400 * 1024
+    for name in ['oldest', 'middle', 'newest']:
+        store(cache, url=f'{URL}/{name}', body=body)
+        clock.sleep(1)
+
+    assert cache.prune() == 1
+    assert not is_cached(cache, URL + '/oldest')
+    assert is_cached(cache, URL + '/middle')
+    assert is_cached(cache, URL + '/newest')
+
+    assert cache.prune(max_size=0) == 2
+    assert not is_cached(cache, URL + '/newest')
+
+
+def test_periodic_pruning(cache, clock, monkeypatch):
+    """The cache is pruned after every `PRUNE_INTERVAL` new responses."""
+    monkeypatch.setattr(response_cache_module, 'PRUNE_INTERVAL', 3)
+    store(cache, url=URL + '/old')
+    clock.sleep(2000)
+
+    store(cache)
+    assert is_cached(cache, URL + '/old')
+    store(cache)
+    assert not is_cached(cache, URL + '/old')
+
+
+def test_outdated_schema(tmp_path):
+    """Caches without usage times are replaced."""
+    path = str(tmp_path / 'responses.sqlite')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE response (key TEXT PRIMARY KEY, etag TEXT, '
+                       'last_modified TEXT, headers TEXT NOT NULL, body BLOB)')
+    connection.commit()
+    connection.close()
+
+    cache = ResponseCache(path, 1, 1000)
+    store(cache)
+    assert is_cached(cache)
@@ -0,0 +1,131 @@
+"""Tests for the routing of requests between several Github tokens."""
+import pytest
+from github import Github as ActualGithub
+
+from gitalizer.helpers.github import budget as budget_module
+from gitalizer.helpers.github import pacer as pacer_module
+from gitalizer.helpers.github import token_pool as token_pool_module
+from gitalizer.helpers.github.pacer import Pacer
+from gitalizer.helpers.github.token_pool import TokenPool
+from gitalizer.extensions.github import hook_requests
+from tests.conftest import headers
+
+
+@pytest.fixture
+def pool(clock, monkeypatch):
+    """Get a pool of two tokens with a reserve of 10, which uses the fake clock."""
+    monkeypatch.setattr(budget_module, 'time', clock)
+    monkeypatch.setattr(token_pool_module, 'time', clock)
+    return TokenPool(['token first', 'token second'], 10)
+
+
+def test_unknown_tokens_first(pool, clock):
+    """Tokens, which haven't been used yet, are preferred."""
+    pool.update(0, headers(4000, clock.now + 100))
+
+    assert pool.acquire() == 1
+
+
+def test_most_requests_left(pool, clock):
+    """Requests are sent with the token, which has the most requests left."""
+    pool.update(0, headers(100, clock.now + 100))
+    pool.update(1, headers(50, clock.now + 100))
+
+    assert pool.best() == 0
+    assert pool.acquire() == 0
+
+    pool.update(0, headers(20, clock.now + 100))
+    assert pool.acquire() == 1
+
+
+def test_parked_tokens(pool, clock):
+    """Tokens at their reserve are parked and skipped."""
+    pool.update(0, headers(10, clock.now + 100))
+    pool.update(1, headers(12, clock.now + 200))
+
+    assert pool.parked() == 1
+    assert pool.acquire() == 1
+    assert pool.acquire() == 1
+    assert pool.parked() == 2
+    assert clock.sleeps == []
+
+
+def test_block_until_first_reset(pool, clock):
+    """Requests block until the first reset, if all tokens are parked."""
+    pool.update(0, headers(10, clock.now + 300))
+    pool.update(1, headers(10, clock.now + 100))
+
+    assert pool.acquire() == 1
+    assert clock.sleeps == [101]
+
+
+def test_prepare(pool):
+    """Requests get the authorization of their token."""
+    request_headers = {'Authorization': 'token first'}
+    pool.prepare(1, request_headers)
+    assert request_headers['Authorization'] == 'token second'
+
+    # A single `None` keeps the credentials of the client.
+    pool = TokenPool([None], 10)
+    request_headers = {'Authorization': 'Basic secret'}
+    pool.prepare(0, request_headers)
+    assert request_headers['Authorization'] == 'Basic secret'
+
+
+def test_status(pool, clock):
+    """The status sums up the budgets of all known tokens."""
+    assert pool.status() == (-1, -1, None)
+
+    pool.update(0, headers(100, clock.now + 300))
+    pool.update(1, headers(50, clock.now + 100))
+    remaining, limit, reset = pool.status()
+
+    assert (remaining, limit) == (150, 10000)
+    assert reset.timestamp() == clock.now + 100
+
+
+def test_hook_routes_requests(pool, clock):
+    """The request hook sends each request with the best token and updates its budget."""
+    pool.update(0, headers(12, clock.now + 100))
+    pool.update(1, headers(11, clock.now + 100))
+    client = ActualGithub('first')
+    requester = client._Github__requester
+
+    sent = []
+
+    def request_raw(cnx, verb, url, request_headers, input):
+        sent.append(request_headers['Authorization'])
+        return 200, {}, '{}'
+
+    requester._Requester__requestRaw = request_raw
+    hook_requests(client, Pacer(60, 30), pool)
+    for _ in range(3):
+        requester._Requester__requestRaw(object(), 'GET', '/user', {}, None)
+
+    assert sent == ['token first', 'token first', 'token second']
+    assert pool.parked() == 2
+
+
+def test_hook_exhausted_token(pool, clock, monkeypatch):
+    """An exhausted token doesn't delay the requests of the other tokens."""
+    monkeypatch.setattr(pacer_module, 'time', clock)
+    pool.update(1, headers(100, clock.now + 100))
+    client = ActualGithub('first')
+    requester = client._Github__requester
+
+    sent = []
+
+    def request_raw(cnx, verb, url, request_headers, input):
+        sent.append(request_headers['Authorization'])
+        if request_headers['Authorization'] == 'token first':
+            return 200, headers(0, clock.now + 3000), '{}'
+        return 200, headers(99, clock.now + 100), '{}'
+
+    requester._Requester__requestRaw = request_raw
+    hook_requests(client, Pacer(60, 30), pool)
+    for _ in range(3):
+        requester._Requester__requestRaw(object(), 'GET', '/user', {}, None)
+
+    assert sent == ['token first', 'token second', 'token second']
+    assert pool.parked() == 1
+    assert clock.sleeps == []